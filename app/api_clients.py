@@ -0,0 +1,71 @@
+# api_clients.py
+
+import os
+import time
+import threading
+
+import httpx
+from openai import OpenAI, DefaultHttpxClient
+from pyht import Client
+
+# keep-alive pool per API key, shared by the script, TTS, embedding and chat stages
+POOL_CONNECTIONS = int(os.getenv('OPENAI_POOL_CONNECTIONS', 20))
+KEEPALIVE_SECONDS = float(os.getenv('OPENAI_KEEPALIVE_SECONDS', 60))
+# clients unused for this long are dropped from the registry
+CLIENT_IDLE_SECONDS = float(os.getenv('API_CLIENT_IDLE_SECONDS', 900))
+
+
+class ClientRegistry:
+    """
+    Thread-safe cache of API clients keyed by credentials, with idle eviction.
+    Evicted clients are only dropped from the registry, never closed: a long-lived
+    holder (e.g. a QA chain) may still be using one, and its connections are
+    released once the last reference goes away.
+    """
+
+    def __init__(self, factory, idle_seconds=CLIENT_IDLE_SECONDS):
+        self.factory = factory
+        self.idle_seconds = idle_seconds
+        self._clients = {}  # key -> (client, last_used)
+        self._lock = threading.Lock()
+
+    def get(self, *key):
+        now = time.monotonic()
+        with self._lock:
+            for stale in [k for k, (_, last_used) in self._clients.items()
+                          if now - last_used > self.idle_seconds and k != key]:
+                del self._clients[stale]
+            client = self._clients[key][0] if key in self._clients else self.factory(*key)
+            self._clients[key] = (client, now)
+            return client
+
+    def __len__(self):
+        return len(self._clients)
+
+
+def _create_http_client(api_key):
+    return DefaultHttpxClient(limits=httpx.Limits(
+        max_connections=POOL_CONNECTIONS,
+        max_keepalive_connections=POOL_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_SECONDS,
+    ))
+
+
+_http_clients = ClientRegistry(_create_http_client)
+_openai_clients = ClientRegistry(lambda api_key: OpenAI(api_key=api_key, http_client=get_http_client(api_key)))
+_playht_clients = ClientRegistry(lambda user_id, api_key: Client(user_id, api_key))
+
+
+def get_http_client(api_key):
+    """Pooled httpx client for api_key; pass it as http_client= to langchain_openai classes."""
+    return _http_clients.get(api_key)
+
+
+def get_openai_client(api_key):
+    """Shared OpenAI client for api_key, backed by the key's keep-alive connection pool."""
+    return _openai_clients.get(api_key)
+
+
+def get_playht_client(user_id, api_key):
+    """Shared Play.ht client (and its gRPC channel) for a Play.ht account."""
+    return _playht_clients.get(user_id, api_key)
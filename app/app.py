@@ -1,12 +1,17 @@
 import os
 import re
+import copy
 import time
 import uuid
+import json
 import base64
+import shutil
+import hashlib
 import fitz  # PyMuPDF
 from tqdm import tqdm
 from PIL import Image
 import subprocess
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 
 from datetime import datetime
 from flask import Flask, Response, request, session, send_file, jsonify, redirect, url_for, render_template, send_from_directory, flash
@@ -14,26 +19,160 @@ from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 from flask_cors import CORS
 
-import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
 from langchain_openai import OpenAIEmbeddings, OpenAI
 from langchain_community.vectorstores import FAISS
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 #for voice clonning
 import requests
-from pyht import Client, TTSOptions, Format
+from pyht import TTSOptions, Format
+
+from api_clients import get_http_client, get_openai_client, get_playht_client
+from file_cache import FileCache
+from throttle import SharedTokenBucket, call_with_retry
+from script_context import ScriptHistory, request_metrics
+from audio_probe import durations as audio_durations, mp3_duration, concat_mp3, ffprobe_duration
+from workspaces import JobWorkspace, WorkspaceJanitor
+from job_queue import JobQueue, start_workers
+from manifest import SlideManifest, inputs_digest
+from llm_cache import ResponseCache, cache_key
+from voice_registry import VoiceRegistry
+from text_chunker import TTS_CHAR_LIMITS, split_text_into_chunks
+from lecture_index import LectureIndexCache, save_lecture_index
+from qa_registry import LectureQA, QARegistry
+from passages import lecture_passages, fit_passages, format_passages, timestamp
 
 load_dotenv()
 
+def parse_size(value):
+    """'1920x1080' -> (1920, 1080)"""
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
 app = Flask(__name__)
 app.secret_key = "..."
 app.config['ALLOWED_EXTENSIONS'] = {'pdf', 'mp3'}
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['OUTPUT_FOLDER'] = 'output'
+# number of worker processes used to rasterize PDF pages (1 = render serially)
+app.config['RENDER_WORKERS'] = int(os.getenv('RENDER_WORKERS', os.cpu_count() or 1))
+# Every page is rendered once per rendition: a small image for the vision model, sized
+# so gpt-4o bills it as a 2x2 grid of 512px tiles, and a frame letterboxed to exactly
+# the video resolution. dpi caps the render resolution (None = size-limited only);
+# format is png, jpeg or webp; compression (0-9, png only, None = PyMuPDF's encoder)
+# and quality (jpeg/webp) tune the encoder.
+app.config['RENDITIONS'] = {
+    'vision': {
+        'dir': 'output/vision',
+        'dpi': int(os.getenv('VISION_DPI', 150)),
+        'size': parse_size(os.getenv('VISION_MAX_SIZE', '1024x768')),
+        'letterbox': False,
+        'format': os.getenv('VISION_FORMAT', 'jpeg'),
+        'compression': None,
+        'quality': int(os.getenv('VISION_QUALITY', 85)),
+    },
+    'frame': {
+        'dir': 'output/images',
+        'dpi': int(os.environ['FRAME_DPI']) if os.getenv('FRAME_DPI') else None,
+        'size': parse_size(os.getenv('VIDEO_RESOLUTION', '1920x1080')),
+        'letterbox': True,
+        'format': os.getenv('FRAME_FORMAT', 'png'),
+        'compression': int(os.environ['FRAME_PNG_COMPRESSION']) if os.getenv('FRAME_PNG_COMPRESSION') else None,
+        'quality': int(os.getenv('FRAME_QUALITY', 90)),
+    },
+}
+# slides scripted in parallel (1 = strictly sequential). Earlier slides are passed back as
+# text only: up to SCRIPT_CONTEXT_SLIDES previous scripts (0 = all), trimmed to
+# SCRIPT_CONTEXT_TOKENS, with older scripts shortened to captions if SCRIPT_CONTEXT_CAPTIONS
+app.config['SCRIPT_CONCURRENCY'] = int(os.getenv('SCRIPT_CONCURRENCY', 4))
+app.config['SCRIPT_CONTEXT_SLIDES'] = int(os.getenv('SCRIPT_CONTEXT_SLIDES', 3))
+app.config['SCRIPT_CONTEXT_TOKENS'] = int(os.getenv('SCRIPT_CONTEXT_TOKENS', 1500))
+app.config['SCRIPT_CONTEXT_CAPTIONS'] = os.getenv('SCRIPT_CONTEXT_CAPTIONS', '1') == '1'
+# slides synthesized in parallel, and per-engine request rates (requests per minute)
+# shared by every job and every worker process through RATE_LIMIT_DB_PATH (SQLite);
+# 429s are retried with jittered backoff
+app.config['TTS_CONCURRENCY'] = int(os.getenv('TTS_CONCURRENCY', 4))
+app.config['OPENAI_TTS_RPM'] = int(os.getenv('OPENAI_TTS_RPM', 50))
+app.config['PLAYHT_RPM'] = int(os.getenv('PLAYHT_RPM', 60))
+app.config['RATE_LIMIT_DB_PATH'] = os.getenv('RATE_LIMIT_DB_PATH', 'output/rate_limits.db')
+# TTS chunks of one slide synthesized at once (still within the engine's RPM)
+app.config['TTS_CHUNK_CONCURRENCY'] = int(os.getenv('TTS_CHUNK_CONCURRENCY', 4))
+# 'streaming': each slide flows render -> script -> TTS -> video segment on its own and the
+# segments are joined at the end; 'staged': each stage finishes for the whole deck first
+app.config['PIPELINE_MODE'] = os.getenv('PIPELINE_MODE', 'streaming')
+# ffmpeg processes encoding slide segments at once
+app.config['ENCODE_WORKERS'] = int(os.getenv('ENCODE_WORKERS', os.cpu_count() or 1))
+# create_video_ffmpeg: 'segments' encodes each slide separately (in parallel, cached by
+# content) and joins them with a stream copy; 'single' runs one big filter_complex
+app.config['VIDEO_MODE'] = os.getenv('VIDEO_MODE', 'segments')
+# encoder settings, selectable per job. 'default' is a full-motion encode; 'slideshow'
+# treats every slide as the still it is: a low frame rate, x264's stillimage tuning and a
+# GOP long enough that keyframes only occur where a slide starts
+app.config['VIDEO_PROFILES'] = {
+    'default': {'fps': 25, 'preset': 'veryfast', 'tune': None, 'gop': None, 'audio_bitrate': '192k'},
+    'slideshow': {'fps': int(os.getenv('SLIDESHOW_FPS', 2)), 'preset': 'medium', 'tune': 'stillimage',
+                  'gop': 100000, 'audio_bitrate': '128k'},
+}
+app.config['VIDEO_PROFILE'] = os.getenv('VIDEO_PROFILE', 'slideshow')
+app.config['SEGMENT_CACHE_DIR'] = os.getenv('SEGMENT_CACHE_DIR', 'output/cache/segments')
+app.config['SEGMENT_CACHE_MAX_MB'] = int(os.getenv('SEGMENT_CACHE_MAX_MB', 4096))
+# rendered pages are reused across uploads, keyed by page content + rendition settings
+app.config['RENDER_CACHE_DIR'] = os.getenv('RENDER_CACHE_DIR', 'output/cache/renders')
+app.config['RENDER_CACHE_MAX_MB'] = int(os.getenv('RENDER_CACHE_MAX_MB', 2048))
+# synthesized slide audio, cached by normalized text, engine, voice and TTS options
+app.config['TTS_CACHE_DIR'] = os.getenv('TTS_CACHE_DIR', 'output/cache/tts')
+app.config['TTS_CACHE_MAX_MB'] = int(os.getenv('TTS_CACHE_MAX_MB', 2048))
+# Play.ht clone IDs, reused for the same user and voice sample; an entry is checked
+# against Play.ht again once it is VOICE_REVALIDATE_HOURS old
+app.config['VOICE_REGISTRY_PATH'] = os.getenv('VOICE_REGISTRY_PATH', 'output/voices.db')
+app.config['VOICE_REVALIDATE_HOURS'] = float(os.getenv('VOICE_REVALIDATE_HOURS', 24))
+# gpt-4o scripts are cached by model, prompts, image and continuity context; entries
+# expire after SCRIPT_CACHE_TTL_DAYS (0 = never), SCRIPT_CACHE_MAX_MB = 0 disables the
+# cache and SCRIPT_CACHE_BYPASS=1 always asks the model (fresh responses still get stored)
+app.config['SCRIPT_CACHE_PATH'] = os.getenv('SCRIPT_CACHE_PATH', 'output/cache/scripts.db')
+app.config['SCRIPT_CACHE_MAX_MB'] = int(os.getenv('SCRIPT_CACHE_MAX_MB', 64))
+app.config['SCRIPT_CACHE_TTL_DAYS'] = float(os.getenv('SCRIPT_CACHE_TTL_DAYS', 30))
+app.config['SCRIPT_CACHE_BYPASS'] = os.getenv('SCRIPT_CACHE_BYPASS', '0') == '1'
+# each video's chat index is saved next to it (<video>.index/) when the job finishes and
+# loaded on demand; loaded indexes are kept in an LRU of about QA_INDEX_CACHE_MB
+app.config['QA_INDEX_CACHE_MB'] = int(os.getenv('QA_INDEX_CACHE_MB', 256))
+# chat state (index, content filter, chains) of up to QA_MAX_LECTURES lectures is kept
+# per process, least recently used dropped first; QA_MAX_CHAINS per lecture cover the
+# different API keys / safety instructions of the users chatting with it
+app.config['QA_MAX_LECTURES'] = int(os.getenv('QA_MAX_LECTURES', 256))
+app.config['QA_MAX_CHAINS'] = int(os.getenv('QA_MAX_CHAINS', 8))
+# lectures are indexed as overlapping passages of about QA_PASSAGE_TOKENS, tagged with
+# their slide and video time; of the QA_RETRIEVE_K best matches for a question, as many
+# as fit in QA_CONTEXT_TOKENS are put in the prompt
+app.config['QA_PASSAGE_TOKENS'] = int(os.getenv('QA_PASSAGE_TOKENS', 120))
+app.config['QA_PASSAGE_OVERLAP_TOKENS'] = int(os.getenv('QA_PASSAGE_OVERLAP_TOKENS', 30))
+app.config['QA_RETRIEVE_K'] = int(os.getenv('QA_RETRIEVE_K', 8))
+app.config['QA_CONTEXT_TOKENS'] = int(os.getenv('QA_CONTEXT_TOKENS', 600))
+# every upload runs in its own workspace, WORKSPACE_ROOT/<job id>, and its video goes to
+# static/<job id>/. The janitor deletes workspaces once a job has been idle for
+# WORKSPACE_MAX_AGE_HOURS, or oldest first while they exceed WORKSPACE_QUOTA_MB (0 = no limit).
+# Finished videos (and their chat indexes) have their own limits, VIDEO_MAX_AGE_DAYS and
+# VIDEO_QUOTA_MB; by default they are kept until their session uploads again or clears
+app.config['WORKSPACE_ROOT'] = os.getenv('WORKSPACE_ROOT', 'output/jobs')
+app.config['WORKSPACE_MAX_AGE_HOURS'] = float(os.getenv('WORKSPACE_MAX_AGE_HOURS', 24))
+app.config['WORKSPACE_QUOTA_MB'] = int(os.getenv('WORKSPACE_QUOTA_MB', 10240))
+app.config['VIDEO_MAX_AGE_DAYS'] = float(os.getenv('VIDEO_MAX_AGE_DAYS', 0))
+app.config['VIDEO_QUOTA_MB'] = int(os.getenv('VIDEO_QUOTA_MB', 0))
+app.config['JANITOR_INTERVAL_SECONDS'] = int(os.getenv('JANITOR_INTERVAL_SECONDS', 600))
+# uploads are queued in JOB_DB_PATH (SQLite) and run by JOB_WORKERS worker processes
+# started with the server (run more with worker.py); /upload_progress only relays a
+# job's progress events, polling every JOB_POLL_SECONDS. Workers send a heartbeat every
+# JOB_HEARTBEAT_SECONDS; a running job without one for JOB_STALE_SECONDS is requeued by the
+# janitor, and its progress stream ends. A stream gives up after JOB_PROGRESS_TIMEOUT_SECONDS
+app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', 2))
+app.config['JOB_DB_PATH'] = os.getenv('JOB_DB_PATH', 'output/jobs.db')
+app.config['JOB_POLL_SECONDS'] = float(os.getenv('JOB_POLL_SECONDS', 0.5))
+app.config['JOB_HEARTBEAT_SECONDS'] = float(os.getenv('JOB_HEARTBEAT_SECONDS', 15))
+app.config['JOB_STALE_SECONDS'] = float(os.getenv('JOB_STALE_SECONDS', 120))
+app.config['JOB_PROGRESS_TIMEOUT_SECONDS'] = float(os.getenv('JOB_PROGRESS_TIMEOUT_SECONDS', 3600))
 app.config.update(
     SESSION_COOKIE_SECURE=True,
     SESSION_COOKIE_SAMESITE='None',
@@ -64,50 +203,70 @@ def after_request(response):
         })
     return response
 
-qa_chain = None
-content_filter = None
-scripts_global = None
+tts_rate_limits = {
+    'openai': SharedTokenBucket(app.config['RATE_LIMIT_DB_PATH'], 'openai', app.config['OPENAI_TTS_RPM'] / 60),
+    'playht': SharedTokenBucket(app.config['RATE_LIMIT_DB_PATH'], 'playht', app.config['PLAYHT_RPM'] / 60),
+}
+render_cache = FileCache(app.config['RENDER_CACHE_DIR'], app.config['RENDER_CACHE_MAX_MB'] * 1024 * 1024)
+segment_cache = FileCache(app.config['SEGMENT_CACHE_DIR'], app.config['SEGMENT_CACHE_MAX_MB'] * 1024 * 1024)
+tts_cache = FileCache(app.config['TTS_CACHE_DIR'], app.config['TTS_CACHE_MAX_MB'] * 1024 * 1024)
+script_cache = ResponseCache(app.config['SCRIPT_CACHE_PATH'], app.config['SCRIPT_CACHE_MAX_MB'] * 1024 * 1024,
+                             ttl_seconds=app.config['SCRIPT_CACHE_TTL_DAYS'] * 86400)
+voice_registry = VoiceRegistry(app.config['VOICE_REGISTRY_PATH'])
+lecture_indexes = LectureIndexCache(app.config['QA_INDEX_CACHE_MB'] * 1024 * 1024)
+job_queue = JobQueue(app.config['JOB_DB_PATH'], secret_params=('api_key', 'playht_api_key'),
+                     heartbeat_interval=app.config['JOB_HEARTBEAT_SECONDS'],
+                     stale_after=app.config['JOB_STALE_SECONDS'])
+qa_lectures = QARegistry(lambda lecture_id, api_key: load_lecture_qa(lecture_id, api_key),
+                         max_lectures=app.config['QA_MAX_LECTURES'])
 
 def setup_directories():
     """Create necessary directories on startup, if they don't exist."""
-    for d in ["uploads", "output/images", "output/scripts", "output/audio", "static"]:
+    for d in [app.config['WORKSPACE_ROOT'], "static"]:
         os.makedirs(d, exist_ok=True)
 
 with app.app_context():
     setup_directories()
 
-def clean_directories(keep_video=None):
-    """
-    cleanup policy: removes old files from directories when a new file is uploaded.
-    :param keep_video: path to the final MP4 we do NOT want to remove.
-    """
-    # remove all previous uploaded pdfs
-    uploads_dir = "uploads"
-    if os.path.exists(uploads_dir):
-        for f in os.listdir(uploads_dir):
-            if f.endswith(".pdf"):
-                os.remove(os.path.join(uploads_dir, f))
+janitor = WorkspaceJanitor(
+    [
+        ([app.config['WORKSPACE_ROOT']], app.config['WORKSPACE_MAX_AGE_HOURS'] * 3600,
+         app.config['WORKSPACE_QUOTA_MB'] * 1024 * 1024),
+        (["static"], app.config['VIDEO_MAX_AGE_DAYS'] * 86400, app.config['VIDEO_QUOTA_MB'] * 1024 * 1024),
+    ],
+    interval=app.config['JANITOR_INTERVAL_SECONDS'],
+    tasks=[job_queue.requeue_orphans]  # jobs whose worker died mid-run
+)
+janitor.start()
 
-    # remove all processing directories
-    for output_dir in ["output/images", "output/scripts", "output/audio"]:
-        if os.path.exists(output_dir):
-            for f in os.listdir(output_dir):
-                os.remove(os.path.join(output_dir, f))
+def job_workspace(job_id):
+    return JobWorkspace(app.config['WORKSPACE_ROOT'], job_id)
 
-    # clean static directory
-    static_dir = "static"
-    if os.path.exists(static_dir):
-        for f in os.listdir(static_dir):
-            if f.endswith(".mp4"):
-                file_path = os.path.join(static_dir, f)
+def clean_directories(job_id):
+    """
+    cleanup policy: removes one job's workspace and video, leaving other jobs alone.
+    """
+    if not job_id:
+        return
+    qa_lectures.discard(job_id)
+    job_workspace(job_id).remove()
+    shutil.rmtree(os.path.join("static", job_id), ignore_errors=True)
 
-                if keep_video and os.path.abspath(file_path) != os.path.abspath(keep_video):
-                    os.remove(file_path)
+def clean_finished_job(job_id):
+    """
+    clean_directories for a job a session is done with - unless it is still queued or
+    running, since deleting its files would only make it fail halfway; the janitor
+    expires those once they are idle.
+    """
+    job = job_queue.get(job_id) if job_id else None
+    if job and job['status'] in ('queued', 'running'):
+        print(f"Job {job_id} is {job['status']}; leaving its files to the janitor")
+        return
+    clean_directories(job_id)
 
 # helper functions
-def save_uploaded_file(uploaded_file, unique_id):
-    """Save uploaded PDF to 'uploads' with a unique ID prefix."""
-    uploads_dir = "uploads"
+def save_uploaded_file(uploaded_file, unique_id, uploads_dir="uploads"):
+    """Save uploaded PDF to uploads_dir with a unique ID prefix."""
     os.makedirs(uploads_dir, exist_ok=True)
     
     original_filename = secure_filename(uploaded_file.filename)
@@ -124,12 +283,21 @@ def encode_image(image_path):
     with open(image_path, "rb") as image_file:
         return base64.b64encode(image_file.read()).decode('utf-8')
 
-def generate_slide_script(image_path, slide_number, total_slides, previous_content=None, api_key=None):
+def image_mime_type(image_path):
+    """MIME type for a rendered slide, used in the data: URL sent to the vision model."""
+    extension = os.path.splitext(image_path)[1].lower()
+    return {'.png': 'image/png', '.webp': 'image/webp'}.get(extension, 'image/jpeg')
+
+def generate_slide_script(image_path, slide_number, total_slides, previous_content=None, api_key=None, metrics=None,
+                          bypass_cache=None, context_key=None):
     """
     generates a teaching script
+    :param metrics: optional list; a dict with the request's size and token usage is appended to it.
+    :param bypass_cache: skip the script cache lookup (defaults to SCRIPT_CACHE_BYPASS).
+    :param context_key: identifies previous_content in the cache key (see script_context_key);
+        defaults to a hash of previous_content itself.
     """
-    from openai import OpenAI
-    client = OpenAI(api_key=api_key)
+    client = get_openai_client(api_key)
 
     base64_image = encode_image(image_path)
     
@@ -183,7 +351,7 @@ Speaking style:
             {
                 "type": "image_url",
                 "image_url": {
-                    "url": f"data:image/jpeg;base64,{base64_image}"
+                    "url": f"data:{image_mime_type(image_path)};base64,{base64_image}"
                 }
             }
         ]
@@ -193,15 +361,43 @@ Speaking style:
     if previous_content:
         messages.extend(previous_content)
     messages.append(user_message)
-    
+
+    model, max_tokens, temperature = "gpt-4o", 350, 0.7
+    key = cache_key(
+        model=model,
+        max_tokens=max_tokens,
+        temperature=temperature,
+        system=system_message["content"],
+        user=user_message["content"][0]["text"],  # includes the position instructions
+        image=hashlib.sha256(base64_image.encode()).hexdigest(),
+        context=context_key or hashlib.sha256(json.dumps(previous_content or []).encode()).hexdigest()
+    )
+    if not (app.config['SCRIPT_CACHE_BYPASS'] if bypass_cache is None else bypass_cache):
+        script_text = script_cache.get(key)
+        if script_text is not None:
+            print(f"[ScriptCache] slide {slide_number}: hit")
+            return script_text, messages
+
+    request_stats = request_metrics(messages)
+    request_stats['slide'] = slide_number
+    if metrics is not None:
+        metrics.append(request_stats)
+
     try:
         response = client.chat.completions.create(
-            model="gpt-4o",
+            model=model,
             messages=messages,
-            max_tokens=350,
-            temperature=0.7
+            max_tokens=max_tokens,
+            temperature=temperature
         )
+        if response.usage:
+            request_stats['prompt_tokens'] = response.usage.prompt_tokens
+        print(f"[ScriptGen] slide {slide_number}: {request_stats['bytes'] / 1024:.0f} KB, "
+              f"{request_stats['images']} image(s), ~{request_stats['estimated_tokens']} tokens "
+              f"(billed: {request_stats.get('prompt_tokens', '?')})")
         script_text = response.choices[0].message.content
+        if script_text:
+            script_cache.put(key, script_text)
         return script_text, messages
     except Exception as e:
         print(f"Error generating script for slide {slide_number}: {str(e)}")
@@ -225,76 +421,95 @@ Speaking style:
 #     time.sleep(1)  # small delay to ensure file is written
 #     return audio_path
 
+def is_complete_mp3(audio_path):
+    """A finished TTS file is non-empty and starts with an ID3 tag or an MPEG frame sync."""
+    try:
+        with open(audio_path, "rb") as f:
+            header = f.read(3)
+    except OSError:
+        return False
+    return header == b"ID3" or (len(header) >= 2 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0)
+
+def tts_cache_key(script_text, engine, voice, options):
+    """Audio is reused for the same words, engine, voice and options, whatever the whitespace."""
+    normalized = " ".join(script_text.split())
+    return cache_key(text=normalized, engine=engine, voice=voice, options=options)
+
 def generate_audio(script_text, slide_number, output_dir, api_key, custom_voice_id, user_id=None):
+    """
+    Synthesize one slide's MP3. Each request waits on the engine's shared rate limit and
+    is retried on 429s; the file is written under a temporary name and only moved into
+    place once every chunk came back and it checks out as a complete MP3 - a slide with a
+    missing chunk raises instead, so it is never checkpointed, cached or put in a video.
+    Audio already synthesized for the same text and voice is linked from the TTS cache.
+    """
     audio_path = os.path.join(output_dir, f"slide_{slide_number}.mp3")
+    partial_path = f"{audio_path}.part"
+
+    if custom_voice_id != 'none':
+        engine, voice = "Play3.0-mini", custom_voice_id
+        options = {'speed': 0.9, 'temperature': 0.1, 'quality': 'Premium', 'voice_guidance': 1,
+                   'style_guidance': 1, 'sample_rate': 24000}
+    else:
+        engine, voice, options = "tts-1", "alloy", {}
+    key = tts_cache_key(script_text, engine, voice, options)
+    if tts_cache.get(key, '.mp3', audio_path):
+        print(f"[TTSCache] slide {slide_number}: hit")
+        return audio_path
     
     if custom_voice_id != 'none':
         # Use Play.ht for custom cloned voice
         print(f"Generating audio for slide {slide_number} with user_id: {user_id}, api_key: {api_key}, voice_id: {custom_voice_id}")  # Debug print
 
-        client = Client(user_id, api_key)  # PlayHT client
+        client = get_playht_client(user_id, api_key)  # shared PlayHT client
 
         # Configure the TTS options
         options = TTSOptions(
             voice=custom_voice_id,  # Use custom voice ID
             format=Format.FORMAT_MP3,
-            speed=0.9,
-            temperature=0.1,
-            quality='Premium',
-            voice_guidance=1,
-            style_guidance=1,
-            sample_rate=24000
+            **options
         )
 
-        # Split the script text into chunks for processing
-        text_chunks = split_text_into_chunks(script_text)
-
-        # Generate the audio for each chunk and save it to the file
-        with open(audio_path, "wb") as audio_file:
-            for chunk_text in text_chunks:
-                if chunk_text.strip():  # Ensure chunk is not empty
-                    try:
-                        # Send the chunk to Play.ht and write the audio stream to the file
-                        for chunk in client.tts(text=chunk_text, voice_engine="Play3.0-mini", options=options):
-                            audio_file.write(chunk)
-                    except Exception as e:
-                        print(f"Error processing chunk for slide {slide_number}: {repr(chunk_text)}")
-                        print(f"Exception: {e}")
-
-        print(f"Audio for slide {slide_number} generated using Play.ht.")
+        bucket = tts_rate_limits['playht']
+        request_audio = lambda chunk_text: b"".join(client.tts(text=chunk_text, voice_engine=engine, options=options))
     else:
         # Use OpenAI's default TTS
-        from openai import OpenAI
-        client = OpenAI(api_key=api_key)
-        response = client.audio.speech.create(
-            model="tts-1",
-            voice="alloy",
-            input=script_text
-        )
-        response.stream_to_file(audio_path)
-    
-    time.sleep(1)  # Small delay to ensure file is written
-    return audio_path
-
-def split_text_into_chunks(text, max_lines=6, max_chars=500):
-    lines = re.split(r'(?<=\]) ', text)  # Split while preserving section headers and timestamps
-    chunks = []
-    chunk = []
-    char_count = 0
+        client = get_openai_client(api_key)
+        bucket = tts_rate_limits['openai']
+        request_audio = lambda chunk_text: client.audio.speech.create(model=engine, voice=voice, input=chunk_text).content
 
-    for line in lines:
-        if char_count + len(line) <= max_chars and len(chunk) < max_lines:
-            chunk.append(line)
-            char_count += len(line)
-        else:
-            chunks.append(" ".join(chunk))
-            chunk = [line]
-            char_count = len(line)
+    # Split the script text into chunks the engine accepts, balanced so they finish together
+    text_chunks = split_text_into_chunks(script_text, max_chars=TTS_CHAR_LIMITS[engine])
 
-    if chunk:
-        chunks.append(" ".join(chunk))
-
-    return chunks
+    def synthesize_chunk(chunk_text):
+        try:
+            # Buffer the whole chunk so a retried request never leaves partial audio behind
+            return call_with_retry(lambda: request_audio(chunk_text), bucket=bucket)
+        except Exception as e:
+            print(f"Error processing chunk for slide {slide_number}: {repr(chunk_text)}")
+            print(f"Exception: {e}")
+            return None
+
+    # Synthesize the chunks concurrently, then join them in order on MP3 frame boundaries
+    with ThreadPoolExecutor(max_workers=max(1, min(len(text_chunks), app.config['TTS_CHUNK_CONCURRENCY']))) as executor:
+        chunk_audio = list(executor.map(synthesize_chunk, text_chunks))
+    failed = sum(audio is None for audio in chunk_audio)
+    if failed:
+        raise RuntimeError(f"TTS failed for {failed} of {len(chunk_audio)} chunks of slide {slide_number}")
+    with open(partial_path, "wb") as audio_file:
+        audio_file.write(concat_mp3(chunk_audio))
+    print(f"Audio for slide {slide_number} generated using {'Play.ht' if custom_voice_id != 'none' else 'OpenAI'}.")
+
+    if not is_complete_mp3(partial_path):
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise RuntimeError(f"TTS returned no valid audio for slide {slide_number}")
+    with open(partial_path, "rb") as f:
+        duration = mp3_duration(f.read())
+    os.replace(partial_path, audio_path)  # swaps the name only, a cached inode is never rewritten
+    audio_durations.record(audio_path, duration)  # spares the video stage a probe
+    tts_cache.put(key, '.mp3', audio_path)
+    return audio_path
 
 def natural_sort_key(s):
     """
@@ -304,63 +519,229 @@ def natural_sort_key(s):
     return [int(text) if text.isdigit() else text.lower()
             for text in re.split(r'(\d+)', s)]
 
-def convert_pdf_to_images(pdf_path):
+IMAGE_EXTENSIONS = {'png': '.png', 'jpeg': '.jpg', 'webp': '.webp'}
+
+def is_slide_image(filename):
+    return filename.lower().endswith(tuple(IMAGE_EXTENSIONS.values()))
+
+def save_pixmap(pixmap, output_path, image_format='png', compression=None, quality=90):
+    """
+    Write a pixmap to disk without materializing pixmap.samples as a bytes copy.
+    PNG (default compression) and JPEG are encoded by PyMuPDF itself; WebP and
+    tuned PNG compression are fed to PIL straight from the pixmap's memoryview.
+    """
+    if image_format == 'jpeg':
+        pixmap.save(output_path, output='jpeg', jpg_quality=quality)
+    elif image_format == 'png' and compression is None:
+        pixmap.save(output_path, output='png')
+    elif image_format in ('png', 'webp'):
+        img_data = Image.frombuffer("RGB", (pixmap.width, pixmap.height), pixmap.samples_mv,
+                                    "raw", "RGB", pixmap.stride, 1)
+        if image_format == 'webp':
+            img_data.save(output_path, 'WEBP', quality=quality)
+        else:
+            img_data.save(output_path, 'PNG', compress_level=compression)
+    else:
+        raise ValueError(f"Unsupported image format: {image_format}")
+
+def rendition_zoom(page_rect, rendition):
+    """Zoom factor that honours the rendition's DPI cap and fits the page inside its size."""
+    zoom = rendition['dpi'] / 72 if rendition.get('dpi') else None
+    if rendition.get('size'):
+        width, height = rendition['size']
+        fit = min(width / page_rect.width, height / page_rect.height)
+        zoom = min(zoom, fit) if zoom else fit
+    return zoom or 300 / 72
+
+def letterbox_pixmap(pixmap, width, height):
+    """Center a pixmap on a black width x height canvas."""
+    canvas = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, width, height), False)
+    canvas.clear_with(0)
+    pixmap.set_origin((width - pixmap.width) // 2, (height - pixmap.height) // 2)
+    canvas.copy(pixmap, pixmap.irect)
+    return canvas
+
+def page_digest(pdf_document, page, resource_hashes):
+    """
+    Hash everything that affects how a page renders: geometry, content stream,
+    resource dictionary, the images/fonts/forms it draws and its annotations.
+    Object numbers are normalised away so a re-saved deck still hashes the same.
+    resource_hashes memoizes per-xref hashes across pages of one document.
+    """
+    def xref_hash(xref, read):
+        if xref not in resource_hashes:
+            resource_hashes[xref] = hashlib.sha256(read(xref)).hexdigest()
+        return resource_hashes[xref]
+
+    kind, resources = pdf_document.xref_get_key(page.xref, "Resources")
+    if kind == 'xref':
+        resources = pdf_document.xref_object(int(resources.split()[0]), compressed=True)
+
+    parts = [
+        fitz.VersionBind,
+        repr((tuple(page.rect), page.rotation)),
+        hashlib.sha256(page.read_contents()).hexdigest(),
+        re.sub(r'\d+ \d+ R', 'R', resources),
+    ]
+    parts += sorted(f"image:{img[7]}:{xref_hash(img[0], pdf_document.xref_stream_raw)}"
+                    for img in page.get_images(full=True))
+    parts += sorted(f"font:{font[4]}:{font[3]}:{font[5]}:"
+                    f"{xref_hash(font[0], lambda xref: pdf_document.extract_font(xref)[3] or b'')}"
+                    for font in page.get_fonts(full=True))
+    parts += sorted(f"form:{xobj[1]}:{xref_hash(xobj[0], pdf_document.xref_stream_raw)}"
+                    for xobj in page.get_xobjects())
+    parts += [repr((annot.type, tuple(annot.rect), annot.info, annot.flags)) for annot in page.annots()]
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+def rendition_cache_key(digest, rendition):
+    settings = {k: v for k, v in rendition.items() if k != 'dir'}
+    return hashlib.sha256(f"{digest}|{json.dumps(settings, sort_keys=True)}".encode()).hexdigest()
+
+def render_pdf_pages(pdf_path, page_numbers, renditions, cache=None):
+    """
+    Render the given (0-based) pages of a PDF once per rendition, to <dir>/page_N.<ext>.
+    Images already in `cache` are linked in instead of rasterized.
+    Runs inside a render worker, so it opens its own fitz document.
+    Returns (pages processed, images served from the cache).
+    """
+    pdf_document = fitz.open(pdf_path)
+    resource_hashes = {}
+    rendered = hits = 0
+    for page_number in page_numbers:
+        page = pdf_document[page_number]
+        digest = page_digest(pdf_document, page, resource_hashes) if cache and cache.enabled else None
+        for rendition in renditions.values():
+            extension = IMAGE_EXTENSIONS[rendition['format']]
+            output_path = os.path.join(rendition['dir'], f'page_{page_number + 1}{extension}')
+            key = rendition_cache_key(digest, rendition) if digest else None
+            if key and cache.get(key, extension, output_path):
+                hits += 1
+                continue
+
+            zoom = rendition_zoom(page.rect, rendition)
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            if rendition.get('letterbox'):
+                pixmap = letterbox_pixmap(pixmap, *rendition['size'])
+            if os.path.lexists(output_path):
+                os.remove(output_path)  # may be a hardlink into the cache
+            save_pixmap(pixmap, output_path, rendition['format'], rendition.get('compression'), rendition.get('quality', 90))
+            pixmap = None  # release the samples before rendering the next image
+            if key:
+                cache.put(key, extension, output_path)
+        rendered += 1
+
+    pdf_document.close()
+    return rendered, hits
+
+def convert_pdf_to_images(pdf_path, workers=None, renditions=None, cache=None):
     """
-    Convert PDF to images in output/images/.
+    Convert PDF to images, one set per rendition (defaults to RENDITIONS:
+    output/vision/ for the script writer, output/images/ for the video).
+    Pages are sharded across `workers` processes (defaults to RENDER_WORKERS);
+    worker k renders pages k, k + workers, k + 2 * workers, ...
+    Unchanged pages are served from `cache` (defaults to the shared render cache).
     """
-    images_dir = "output/images"
-    os.makedirs(images_dir, exist_ok=True)
+    renditions = renditions or app.config['RENDITIONS']
+    cache = cache or render_cache
+    for rendition in renditions.values():
+        if rendition['format'] not in IMAGE_EXTENSIONS:
+            raise ValueError(f"Unsupported image format: {rendition['format']}")
+        os.makedirs(rendition['dir'], exist_ok=True)
 
     pdf_document = fitz.open(pdf_path)
     page_count = pdf_document.page_count
-    for page_number in tqdm(range(pdf_document.page_count), desc="Converting PDF pages", unit="page"):
-        page = pdf_document[page_number]
-        zoom = 300 / 72
-        matrix = fitz.Matrix(zoom, zoom)
-        pixmap = page.get_pixmap(matrix=matrix)
-        img_data = Image.frombytes("RGB", [pixmap.width, pixmap.height], pixmap.samples)
-        output_path = os.path.join(images_dir, f'page_{page_number + 1}.png')
-        img_data.save(output_path, 'PNG')
-    
     pdf_document.close()
+
+    workers = min(workers or app.config['RENDER_WORKERS'], page_count)
+    if workers <= 1:
+        pages = tqdm(range(page_count), desc="Converting PDF pages", unit="page")
+        _, hits = render_pdf_pages(pdf_path, pages, renditions, cache)
+    else:
+        hits = 0
+        shards = [range(start, page_count, workers) for start in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(render_pdf_pages, pdf_path, shard, renditions, cache) for shard in shards]
+            with tqdm(total=page_count, desc="Converting PDF pages", unit="page") as progress:
+                for future in as_completed(futures):
+                    rendered, shard_hits = future.result()
+                    hits += shard_hits
+                    progress.update(rendered)
+
+    if cache.enabled:
+        print(f"[RenderCache] {hits}/{page_count * len(renditions)} images served from cache")
+        cache.evict()
     return page_count
 
-def generate_scripts_for_images(images_dir, api_key):
+def save_script(scripts_dir, slide_number, script_text):
+    script_path = os.path.join(scripts_dir, f"slide_{slide_number}_script.txt")
+    with open(script_path, "w", encoding="utf-8") as f:
+        f.write(script_text)
+
+def new_script_history(context_slides=None, context_tokens=None):
+    return ScriptHistory(
+        context_slides if context_slides is not None else app.config['SCRIPT_CONTEXT_SLIDES'],
+        context_tokens or app.config['SCRIPT_CONTEXT_TOKENS'],
+        captions=app.config['SCRIPT_CONTEXT_CAPTIONS']
+    )
+
+def script_context_key(history, slide_number, image_digests):
+    """
+    Script cache key part for a slide's continuity context. With concurrent scripting the
+    context is whichever predecessors happen to have finished, so it is keyed by the
+    images of the slides in its window instead: the same deck hits on every run. The
+    budget and caption setting the context is compacted with are part of it too.
+    :param image_digests: {slide: content hash of its image}, covering history.window(slide_number)
     """
-    Generate a text script for each image (slide), building a conversation context across them.
+    return inputs_digest('context', history.context_tokens, history.captions,
+                         *(image_digests[j] for j in history.window(slide_number)))
+
+def script_slide(image_file, slide_number, total_slides, api_key, history, scripts_dir="output/scripts",
+                 context_key=None):
+    """Script one slide with text-only context from `history`, save it and record it there."""
+    script_text, _ = generate_slide_script(
+        image_file,
+        slide_number=slide_number,
+        total_slides=total_slides,
+        previous_content=history.context_for(slide_number),
+        api_key=api_key,
+        metrics=history.metrics,
+        context_key=context_key
+    )
+    save_script(scripts_dir, slide_number, script_text)
+    history.record(slide_number, script_text)
+    return script_text
+
+def generate_scripts_for_images(images_dir, api_key, concurrency=None, context_slides=None, context_tokens=None,
+                                scripts_dir="output/scripts"):
+    """
+    Generate a text script for each image (slide).
+    Up to `concurrency` slides are scripted at once (1 = one after another). Only the current
+    slide's image is sent; for continuity each request carries the text of whichever of its
+    `context_slides` predecessors have finished, trimmed to `context_tokens`.
+    Scripts are returned (and saved as scripts_dir/slide_N_script.txt) in slide order.
     """
-    scripts_dir = "output/scripts"
     os.makedirs(scripts_dir, exist_ok=True)
+    concurrency = concurrency or app.config['SCRIPT_CONCURRENCY']
 
     # sort images in natural order
     image_files = sorted(
-        [os.path.join(images_dir, f) for f in os.listdir(images_dir) if f.endswith(".png")],
+        [os.path.join(images_dir, f) for f in os.listdir(images_dir) if is_slide_image(f)],
         key=natural_sort_key
     )
 
     total_slides = len(image_files)
-    conversation_history = []
-    scripts_list = []
-
-    for i, image_file in enumerate(image_files, start=1):
-        script_text, updated_history = generate_slide_script(
-            image_file,
-            slide_number=i,
-            total_slides=total_slides,
-            previous_content=conversation_history,
-            api_key=api_key
-        )
-        # update conversation
-        conversation_history = updated_history
-        conversation_history.append({"role": "assistant", "content": script_text})
-        
-        # save script to file
-        script_path = os.path.join(scripts_dir, f"slide_{i}_script.txt")
-        with open(script_path, "w", encoding="utf-8") as f:
-            f.write(script_text)
-        
-        scripts_list.append(script_text)
-
+    history = new_script_history(context_slides, context_tokens)
+    image_digests = {i: file_digest(image_file) for i, image_file in enumerate(image_files, start=1)}
+
+    # slides are submitted in order, so a slide's predecessors are normally done or in flight
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = [executor.submit(script_slide, image_file, i, total_slides, api_key, history, scripts_dir,
+                                   script_context_key(history, i, image_digests))
+                   for i, image_file in enumerate(image_files, start=1)]
+        scripts_list = [future.result() for future in futures]
+
+    if history.metrics:
+        print(f"[ScriptGen] {history.summary()}")
     return scripts_list
 
 # def generate_audio_files(scripts_list, api_key):
@@ -381,60 +762,61 @@ def generate_scripts_for_images(images_dir, api_key):
 #     return audio_dir
 
 # Function to generate audio files
-def generate_audio_files(scripts_list, openai_api_key, custom_voice_id, playht_api_key=None, user_id=None):
+def synthesize_slide_audio(script_text, slide_number, audio_dir, openai_api_key, custom_voice_id, playht_api_key=None, user_id=None):
+    """Generate one slide's MP3 with the right engine. Returns its path, or None on failure."""
+    try:
+        if custom_voice_id != 'none':
+            # Use Play.ht for custom voice
+            return generate_audio(script_text, slide_number, audio_dir, playht_api_key, custom_voice_id, user_id)
+        # Use OpenAI TTS for default voice
+        return generate_audio(script_text, slide_number, audio_dir, openai_api_key, custom_voice_id)
+    except Exception as e:
+        print(f"Error generating audio for slide {slide_number}: {e}")
+        return None
+
+def generate_audio_files(scripts_list, openai_api_key, custom_voice_id, playht_api_key=None, user_id=None, concurrency=None,
+                         audio_dir=None):
     """
     Generate audio files for the given scripts using either OpenAI TTS or Play.ht custom voice.
+    Up to `concurrency` slides (defaults to TTS_CONCURRENCY) are synthesized at once.
         str: Path to the directory containing the generated audio files.
     """
-    audio_dir = os.path.join(app.config['OUTPUT_FOLDER'], 'audio')
+    audio_dir = audio_dir or os.path.join(app.config['OUTPUT_FOLDER'], 'audio')
     os.makedirs(audio_dir, exist_ok=True)
-    
-    for i, script_text in enumerate(scripts_list, start=1):
-        if not script_text.strip():
-            print(f"Warning: Script for slide {i} is empty. Skipping audio generation.")
-            continue
-        
-        try:
-            if custom_voice_id != 'none':
-                # Use Play.ht for custom voice
-                if not playht_api_key or not user_id:
-                    raise ValueError("Play.ht API key and user ID are required for custom voice generation.")
-                audio_path = generate_audio(
-                    script_text, i, audio_dir, playht_api_key, custom_voice_id, user_id
-                )
-            else:
-                # Use OpenAI TTS for default voice
-                audio_path = generate_audio(
-                    script_text, i, audio_dir, openai_api_key, custom_voice_id
-                )
-            
-            # Verify the audio file was created
-            if not (os.path.exists(audio_path) and os.path.getsize(audio_path) > 0):
-                print(f"Warning: Audio file {audio_path} not created properly")
-        except Exception as e:
-            print(f"Error generating audio for slide {i}: {e}")
-    
+    concurrency = concurrency or app.config['TTS_CONCURRENCY']
+
+    if custom_voice_id != 'none' and (not playht_api_key or not user_id):
+        print("Error generating audio: Play.ht API key and user ID are required for custom voice generation.")
+        return audio_dir
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {}
+        for i, script_text in enumerate(scripts_list, start=1):
+            if not script_text.strip():
+                print(f"Warning: Script for slide {i} is empty. Skipping audio generation.")
+                continue
+            futures[i] = executor.submit(synthesize_slide_audio, script_text, i, audio_dir,
+                                         openai_api_key, custom_voice_id, playht_api_key, user_id)
+        failed = [i for i, future in futures.items() if not future.result()]
+
+    tts_cache.evict()
+    if failed:
+        raise RuntimeError(f"Audio generation failed for slide(s) {', '.join(map(str, failed))}")
     return audio_dir
 
 
 def get_audio_duration(audio_path):
     """
-    Get audio duration using ffprobe.
+    Get audio duration, parsed in-process from the MP3 frame headers (ffprobe only for
+    other formats) and cached by path, size and mtime.
     """
-    
-    result = subprocess.run(
-        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-         '-of', 'default=noprint_wrappers=1:nokey=1', audio_path],
-        capture_output=True,
-        text=True
-    )
-    return float(result.stdout.strip()) if result.stdout.strip() else 0.0
+    return audio_durations.get(audio_path)
 
 def get_sorted_pairs(images_dir, audio_dir):
     """
     Match images with audio files ensuring proper synchronization.
     """
-    images = sorted([f for f in os.listdir(images_dir) if f.endswith(".png")],
+    images = sorted([f for f in os.listdir(images_dir) if is_slide_image(f)],
                    key=lambda x: int(re.search(r'page_(\d+)', x).group(1)))
     audio_files = sorted([f for f in os.listdir(audio_dir) if f.endswith(".mp3")],
                         key=lambda x: int(re.search(r'slide_(\d+)', x).group(1)))
@@ -445,11 +827,17 @@ def get_sorted_pairs(images_dir, audio_dir):
             if int(re.search(r'page_(\d+)', img).group(1)) == 
                int(re.search(r'slide_(\d+)', aud).group(1))]
 
-def create_video_ffmpeg(images_dir, audio_dir, output_path="slideshow.mp4"):
+def create_video_ffmpeg(images_dir, audio_dir, output_path="slideshow.mp4", mode=None, profile=None, cache=None,
+                        segments_dir="output/segments"):
     """
     Create final video with proper synchronization between slides and audio.
     Each slide is shown exactly for the duration of its corresponding audio track.
+    mode (defaults to VIDEO_MODE): 'segments' encodes every slide to its own segment with
+    ENCODE_WORKERS ffmpeg processes, reusing cached segments of unchanged slides, and joins
+    them with a stream copy; 'single' encodes everything in one ffmpeg process.
+    profile names an entry of VIDEO_PROFILES (defaults to VIDEO_PROFILE).
     """
+    settings = video_profile(profile)
 
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
@@ -457,16 +845,30 @@ def create_video_ffmpeg(images_dir, audio_dir, output_path="slideshow.mp4"):
     if not pairs:
         raise ValueError("No valid image-audio pairs found")
 
+    if (mode or app.config['VIDEO_MODE']) == 'segments':
+        os.makedirs(segments_dir, exist_ok=True)
+        jobs = [(img, aud, os.path.join(segments_dir, os.path.basename(aud).replace('.mp3', '.mp4')))
+                for img, aud in pairs]
+        with ThreadPoolExecutor(max_workers=max(1, app.config['ENCODE_WORKERS'])) as executor:
+            segment_paths = list(executor.map(lambda job: encode_slide_segment(*job, profile=profile, cache=cache), jobs))
+        concat_segments(segment_paths, output_path)
+        (cache or segment_cache).evict()
+        return
+
     filter_complex = []
     inputs = []
+    keyframe_times = []
+    elapsed = 0.0
     
-    for i, (img, aud) in enumerate(pairs):
-        inputs.extend(['-loop', '1', '-i', img, '-i', aud])
-        duration = get_audio_duration(aud)
+    durations = audio_durations.get_many([aud for _, aud in pairs])
+    for i, ((img, aud), duration) in enumerate(zip(pairs, durations)):
+        inputs.extend(['-loop', '1', '-framerate', str(settings['fps']), '-i', img, '-i', aud])
         filter_complex.extend([
-            f'[{2*i}:v]trim=duration={duration},setpts=PTS-STARTPTS[v{i}];',
+            f'[{2*i}:v]{scale_filter()},trim=duration={duration},setpts=PTS-STARTPTS[v{i}];',
             f'[{2*i+1}:a]acopy[a{i}];'
         ])
+        keyframe_times.append(f'{elapsed:.3f}')
+        elapsed += duration
 
     concat_parts = []
     for i in range(len(pairs)):
@@ -482,11 +884,11 @@ def create_video_ffmpeg(images_dir, audio_dir, output_path="slideshow.mp4"):
         '-filter_complex', ''.join(filter_complex),
         '-map', '[outv]', 
         '-map', '[outa]',
-        '-c:v', 'libx264', 
-        '-preset', 'veryfast',
+        *video_codec_args(settings),
+        # one keyframe at the start of every slide
+        '-force_key_frames', ','.join(keyframe_times),
         '-c:a', 'aac', 
-        '-b:a', '192k',
-        '-pix_fmt', 'yuv420p',
+        '-b:a', settings['audio_bitrate'],
         output_path
     ]
     
@@ -502,6 +904,355 @@ def create_video_ffmpeg(images_dir, audio_dir, output_path="slideshow.mp4"):
         
     print(f"Video created successfully at: {output_path}")
 
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def video_profile(name=None):
+    name = name or app.config['VIDEO_PROFILE']
+    if name not in app.config['VIDEO_PROFILES']:
+        raise ValueError(f"Unknown video profile: {name}")
+    return app.config['VIDEO_PROFILES'][name]
+
+def scale_filter():
+    """Fit the frame into the video resolution (letterboxed) before it reaches the encoder."""
+    width, height = app.config['RENDITIONS']['frame']['size']
+    return (f'scale={width}:{height}:force_original_aspect_ratio=decrease,'
+            f'pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1')
+
+def video_codec_args(settings):
+    args = ['-r', str(settings['fps']), '-c:v', 'libx264', '-preset', settings['preset']]
+    if settings.get('tune'):
+        args += ['-tune', settings['tune']]
+    if settings.get('gop'):
+        args += ['-g', str(settings['gop'])]
+    return args + ['-pix_fmt', 'yuv420p']
+
+def segment_encode_args(profile=None):
+    """Fixed output parameters shared by every slide segment of a profile."""
+    settings = video_profile(profile)
+    return [
+        '-vf', scale_filter(),
+        *video_codec_args(settings),
+        '-c:a', 'aac',
+        '-b:a', settings['audio_bitrate'],
+        '-ar', '48000',
+        '-ac', '2',
+    ]
+
+def encode_slide_segment(image_path, audio_path, segment_path, profile=None, cache=None):
+    """
+    Encode one slide - its image held for the length of its audio - to an MP4 segment.
+    Every segment gets the same resolution, frame rate and codec settings, so they can
+    be joined by concat_segments without re-encoding; each one starts on a keyframe.
+    Segments are cached by the content of the image and audio plus the encoder settings,
+    so only changed slides are encoded. The encoded duration is measured here, in the
+    encode pool, and kept (and cached) next to the segment for slide_timeline.
+    """
+    cache = cache or segment_cache
+    encode_args = segment_encode_args(profile)
+    duration_path = segment_duration_path(segment_path)
+    key = None
+    if cache.enabled:
+        key = hashlib.sha256("|".join([file_digest(image_path), file_digest(audio_path), *encode_args]).encode()).hexdigest()
+        if cache.get(key, '.mp4', segment_path):
+            if not cache.get(key, '.duration', duration_path):  # cached before durations were kept
+                store_segment_duration(segment_path)
+                cache.put(key, '.duration', duration_path)
+            return segment_path
+
+    duration = get_audio_duration(audio_path)
+    cmd = [
+        'ffmpeg', '-y',
+        '-loop', '1', '-framerate', str(video_profile(profile)['fps']), '-i', image_path,
+        '-i', audio_path,
+        '-t', f'{duration}',
+        *encode_args,
+        segment_path
+    ]
+    for path in (segment_path, duration_path):
+        if os.path.lexists(path):
+            os.remove(path)  # may be a hardlink into the cache
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed to encode segment {segment_path}: {result.stderr}")
+    store_segment_duration(segment_path)
+    if key:
+        cache.put(key, '.mp4', segment_path)
+        cache.put(key, '.duration', duration_path)
+    return segment_path
+
+def segment_duration_path(segment_path):
+    return f"{os.path.splitext(segment_path)[0]}.duration"
+
+def store_segment_duration(segment_path):
+    """Probe an encoded segment's duration and save it next to the segment."""
+    duration = ffprobe_duration(segment_path)
+    duration_path = segment_duration_path(segment_path)
+    tmp_path = f"{duration_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(f"{duration}\n")
+    os.replace(tmp_path, duration_path)  # never write through a hardlink into the cache
+    return duration
+
+def stored_segment_duration(segment_path):
+    """Duration saved by store_segment_duration, or None if it wasn't kept."""
+    try:
+        with open(segment_duration_path(segment_path), encoding="utf-8") as f:
+            return float(f.read())
+    except (FileNotFoundError, ValueError):
+        return None
+
+def concat_segments(segment_paths, output_path):
+    """Join slide segments in order with the concat demuxer, copying the streams."""
+    if not segment_paths:
+        raise ValueError("No video segments to join")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    list_path = f"{output_path}.segments.txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for segment_path in segment_paths:
+            escaped = os.path.abspath(segment_path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    cmd = ['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', list_path,
+           '-c', 'copy', '-movflags', '+faststart', output_path]
+    print(f"Running FFmpeg command to join {len(segment_paths)} segments: {' '.join(cmd)}")
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    os.remove(list_path)
+
+    if result.returncode != 0:
+        print(f"FFmpeg error: {result.stderr}")
+        raise RuntimeError(f"Failed to create video: {result.stderr}")
+    print(f"Video created successfully at: {output_path}")
+
+def run_streaming_pipeline(pdf_path, output_path, api_key, custom_voice_id, playht_api_key=None, user_id=None,
+                           video_profile_name=None, workspace=None):
+    """
+    Turn a PDF into a narrated video with every slide flowing through
+    render -> script -> TTS -> video segment as soon as its own inputs are ready,
+    then join the segments with a stream copy.
+    Generator: yields the upload_progress stage number (1-5) each time the first slide
+    reaches a new stage, and returns the scripts in slide order.
+    video_profile_name selects the encoder settings (see VIDEO_PROFILES).
+    Intermediate files go to the job's workspace (a fresh one if not given).
+    Every finished step is checkpointed in the workspace's manifest.json with the hashes
+    of what it produced and was built from; running the same job again (see /resume_job)
+    reuses each slide's valid checkpoints and only redoes missing or invalidated steps.
+    """
+    workspace = (workspace or job_workspace(str(uuid.uuid4()))).create()
+    renditions = workspace.renditions(app.config['RENDITIONS'])
+    scripts_dir, audio_dir, segments_dir = workspace.dir('scripts'), workspace.dir('audio'), workspace.dir('segments')
+    if custom_voice_id != 'none' and (not playht_api_key or not user_id):
+        raise ValueError("Play.ht API key and user ID are required for custom voice generation.")
+    video_profile(video_profile_name)  # fail fast on an unknown profile
+
+    def rendered(rendition, slide_number):
+        return os.path.join(rendition['dir'], f"page_{slide_number}{IMAGE_EXTENSIONS[rendition['format']]}")
+
+    pdf_document = fitz.open(pdf_path)
+    total_slides = pdf_document.page_count
+    pdf_document.close()
+
+    manifest = SlideManifest(os.path.join(workspace.path, 'manifest.json'))
+    pdf_digest = file_digest(pdf_path)
+    rendition_settings = json.dumps({name: {k: v for k, v in rendition.items() if k != 'dir'}
+                                     for name, rendition in renditions.items()}, sort_keys=True)
+    encode_args = segment_encode_args(video_profile_name)
+
+    def step_inputs(step, slide_number):
+        """Digest of everything a step's output depends on, chained from the upstream checkpoints."""
+        if step == 'render':
+            return inputs_digest(pdf_digest, slide_number, rendition_settings)
+        if step == 'script':
+            return inputs_digest(manifest.digest(slide_number, 'render', 'vision'))
+        if step == 'tts':
+            return inputs_digest(manifest.digest(slide_number, 'script', 'script'), custom_voice_id)
+        return inputs_digest(manifest.digest(slide_number, 'render', 'frame'),
+                             manifest.digest(slide_number, 'tts', 'audio'), *encode_args)
+
+    def step_artifacts(step, slide_number, result):
+        if step == 'render':
+            return {'vision': rendered(renditions['vision'], slide_number),
+                    'frame': rendered(renditions['frame'], slide_number)}
+        if step == 'script':
+            return {'script': os.path.join(scripts_dir, f"slide_{slide_number}_script.txt")}
+        return {'audio' if step == 'tts' else 'segment': result}
+
+    def checkpointed_result(step, artifacts):
+        if step == 'script':
+            with open(artifacts['script'], encoding="utf-8") as f:
+                return f.read()
+        return artifacts.get('audio' if step == 'tts' else 'segment')
+
+    yield 1
+    stage = 1
+    history = new_script_history()
+    scripts = [""] * total_slides
+    segments = {}
+    rendered_slides = set()
+    awaiting_script = set()
+    reused = 0
+    render_workers = max(1, min(app.config['RENDER_WORKERS'], total_slides))
+
+    with ProcessPoolExecutor(max_workers=render_workers) as render_pool, \
+            ThreadPoolExecutor(max_workers=max(1, app.config['SCRIPT_CONCURRENCY'])) as script_pool, \
+            ThreadPoolExecutor(max_workers=max(1, app.config['TTS_CONCURRENCY'])) as tts_pool, \
+            ThreadPoolExecutor(max_workers=max(1, app.config['ENCODE_WORKERS'])) as encode_pool:
+        pending = {}
+
+        def schedule(step, slide_number, pool, func, *args):
+            """Submit a step, or complete it straight from its checkpoint if that is still valid."""
+            nonlocal reused
+            inputs = step_inputs(step, slide_number)
+            artifacts = manifest.valid(slide_number, step, inputs)
+            if artifacts is None:
+                pending[pool.submit(func, *args)] = (step, slide_number, inputs)
+                return
+            future = Future()
+            future.set_result(checkpointed_result(step, artifacts))
+            pending[future] = (step, slide_number, None)
+            reused += 1
+
+        for n in range(total_slides):
+            schedule('render', n + 1, render_pool, render_pdf_pages, pdf_path, [n], renditions, render_cache)
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step, slide_number, inputs = pending.pop(future)
+                    result = future.result()
+                    workspace.touch()  # keeps the janitor away while the job is running
+                    if inputs is not None and (result or step == 'render'):
+                        manifest.record(slide_number, step, step_artifacts(step, slide_number, result), inputs)
+                    if step == 'render':
+                        next_stage = 2
+                        # a slide's script is cached by the images of its context window (see
+                        # script_context_key), so it starts once those are rendered too
+                        rendered_slides.add(slide_number)
+                        awaiting_script.add(slide_number)
+                        for n in sorted(awaiting_script):
+                            if not all(j in rendered_slides for j in history.window(n)):
+                                continue
+                            awaiting_script.discard(n)
+                            image_digests = {j: manifest.digest(j, 'render', 'vision') for j in history.window(n)}
+                            schedule('script', n, script_pool,
+                                     script_slide, rendered(renditions['vision'], n), n,
+                                     total_slides, api_key, history, scripts_dir,
+                                     script_context_key(history, n, image_digests))
+                    elif step == 'script':
+                        next_stage = 3
+                        scripts[slide_number - 1] = result
+                        if inputs is None:
+                            history.record(slide_number, result)  # context for the slides still to script
+                        if not result.strip():
+                            print(f"Warning: Script for slide {slide_number} is empty. Skipping audio generation.")
+                            continue
+                        schedule('tts', slide_number, tts_pool,
+                                 synthesize_slide_audio, result, slide_number, audio_dir,
+                                 api_key, custom_voice_id, playht_api_key, user_id)
+                    elif step == 'tts':
+                        next_stage = 4
+                        if not result:
+                            continue
+                        segment_path = os.path.join(segments_dir, f"slide_{slide_number}.mp4")
+                        schedule('segment', slide_number, encode_pool,
+                                 encode_slide_segment, rendered(renditions['frame'], slide_number), result,
+                                 segment_path, video_profile_name)
+                    else:
+                        next_stage = 4
+                        segments[slide_number] = result
+                    if next_stage > stage:
+                        stage = next_stage
+                        yield stage
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+    if reused:
+        print(f"[Checkpoint] {reused} slide steps reused from {manifest.path}")
+    if history.metrics:
+        print(f"[ScriptGen] {history.summary()}")
+    # the slides that did finish are checkpointed: /resume_job redoes only the others
+    missing = [n for n in range(1, total_slides + 1) if n not in segments]
+    if missing:
+        raise RuntimeError(f"Slide(s) {', '.join(map(str, missing))} failed (empty script or no audio); "
+                           f"resume the job to retry them")
+    concat_segments([segments[n] for n in sorted(segments)], output_path)
+    render_cache.evict()
+    segment_cache.evict()
+    tts_cache.evict()
+    yield 5
+    return scripts
+
+def publish_stages(pipeline, publish):
+    """Publish a pipeline generator's stage numbers as job events and return its result."""
+    while True:
+        try:
+            stage = next(pipeline)
+        except StopIteration as finished:
+            return finished.value
+        publish(stage)
+
+def run_job(job, publish):
+    """
+    Run one queued upload in a worker process, from the parameters stored with the job
+    (never the Flask session). Publishes stage numbers 1-5; returns the scripts for QA.
+    """
+    params = job['params']
+    workspace = job_workspace(job['id'])
+    if params['pipeline_mode'] == 'streaming':
+        # every slide moves through render -> script -> TTS -> segment independently
+        scripts = publish_stages(run_streaming_pipeline(
+            params['pdf_path'], params['output_path'], params['api_key'], params['custom_voice_id'],
+            params.get('playht_api_key'), params.get('playht_user_id'), params['video_profile'], workspace
+        ), publish)
+    else:
+        renditions = workspace.create().renditions(app.config['RENDITIONS'])
+        # PDF to images
+        publish(1)
+        images = convert_pdf_to_images(params['pdf_path'], renditions=renditions)
+        if images < 10:
+            time.sleep(2)
+        # create scripts for each image
+        publish(2)
+        workspace.touch()
+        scripts = generate_scripts_for_images(renditions['vision']['dir'], params['api_key'],
+                                              scripts_dir=workspace.dir('scripts'))
+
+        publish(3)
+        workspace.touch()
+        generate_audio_files(scripts, params['api_key'], params['custom_voice_id'],
+                             params.get('playht_api_key'), params.get('playht_user_id'),
+                             audio_dir=workspace.dir('audio'))
+
+        # produce final video
+        publish(4)
+        workspace.touch()
+        create_video_ffmpeg(renditions['frame']['dir'], workspace.dir('audio'), params['output_path'],
+                            profile=params['video_profile'], segments_dir=workspace.dir('segments'))
+        publish(5)
+
+    if not os.path.exists(params['output_path']):
+        raise RuntimeError(f"Video was not created at {params['output_path']}")
+
+    # embed the lecture for chat now, so opening its chat never waits on embeddings
+    try:
+        timeline = slide_timeline(workspace.dir('audio'), workspace.dir('segments'))
+        store = build_lecture_index(scripts, params['api_key'], timeline)
+        save_lecture_index(store, lecture_index_dir(params['output_path']))
+    except Exception as e:
+        print(f"Warning: lecture index not saved: {e}")
+    return {'scripts': scripts}
+
+def job_worker():
+    """Worker process entry point: run queued jobs until killed."""
+    job_queue.work(run_job, poll_interval=app.config['JOB_POLL_SECONDS'])
+
 def encode(path: str):
     return '*#*'.join(path.split('/'))
     
@@ -554,9 +1305,15 @@ def upload_file():
     if 'pdf_file' not in request.files:
         return jsonify({"error": "No file uploaded"}), 400
 
+    file = request.files['pdf_file']
+    if not file.filename.endswith('.pdf'):
+        return jsonify({"error": "Only PDF files are allowed"}), 400
+
+    video_profile_name = request.form.get('video_profile') or app.config['VIDEO_PROFILE']
+    if video_profile_name not in app.config['VIDEO_PROFILES']:
+        return jsonify({"error": f"Unknown video profile: {video_profile_name}"}), 400
+
     voice_type = request.form['voice_type']
-    # Handle custom voice
-    custom_voice_id = 'none'
     if voice_type == 'custom':
         custom_voice_file = request.files['audio_file']
         voice_source = request.form['voice_source']  # 'upload' or 'record'
@@ -564,47 +1321,69 @@ def upload_file():
         playht_api_key = request.form['playht_api_key']
         if voice_type == 'custom' and (not playht_api_key or not playht_user_id):
                 return jsonify({"error": "Invalid Play.ht API key"})
+
+    # each upload gets its own workspace, created only once the request is valid
+    previous_job_id = session.get('job_id')
+    unique_id = str(uuid.uuid4())
+    workspace = job_workspace(unique_id).create()
+
+    # Handle custom voice
+    custom_voice_id = 'none'
+    if voice_type == 'custom':
         session['playht_user_id'] = playht_user_id
         session['playht_api_key'] = playht_api_key
 
         if voice_source == 'upload' and custom_voice_file and allowed_file(custom_voice_file.filename):
             # Save the uploaded custom voice file
-            custom_voice_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(custom_voice_file.filename))
+            custom_voice_path = os.path.join(workspace.dir('uploads'), secure_filename(custom_voice_file.filename))
             custom_voice_file.save(custom_voice_path)
         elif voice_source == 'record' and custom_voice_file and allowed_file(custom_voice_file.filename):
             # Save the recorded custom voice file
-            custom_voice_path = os.path.join(app.config['UPLOAD_FOLDER'], 'recorded_voice.mp3')
+            custom_voice_path = os.path.join(workspace.dir('uploads'), 'recorded_voice.mp3')
             custom_voice_file.save(custom_voice_path)
         
         # Get the custom voice ID
-        custom_voice_id = get_voice_id(custom_voice_path, playht_api_key, playht_user_id)
+        custom_voice_id = get_cached_voice_id(custom_voice_path, playht_api_key, playht_user_id)
         if not custom_voice_id:
+            workspace.remove()
             return jsonify({"error": "Failed to generate custom voice. Try again!"})
 
-    file = request.files['pdf_file']
-    if not file.filename.endswith('.pdf'):
-        return jsonify({"error": "Only PDF files are allowed"}), 400
-
     try:
-        # unique ID for this upload
-        unique_id = str(uuid.uuid4())
         # video_filename = f"{unique_id}_slideshow.mp4"
         filename = file.filename.split('.')[0]
-        video_filename = f"{filename}.mp4"
+        video_filename = f"{unique_id}/{filename}.mp4"
         output_path = os.path.join(os.path.abspath("static"), video_filename)
-        clean_directories(keep_video=output_path)
-        pdf_path = save_uploaded_file(file, unique_id)
+        pdf_path = save_uploaded_file(file, unique_id, workspace.dir('uploads'))
 
+        session['job_id'] = unique_id
         session['video_filename'] = video_filename
         session['output_path'] = output_path
         session['pdf_path'] = pdf_path
         session['custom_voice_id'] = custom_voice_id
+        session['video_profile'] = video_profile_name
+
+        # the job carries everything it needs: workers have no access to the session
+        job_queue.enqueue(unique_id, {
+            'pdf_path': pdf_path,
+            'output_path': output_path,
+            'api_key': session['api_key'],
+            'custom_voice_id': custom_voice_id,
+            'playht_user_id': session.get('playht_user_id'),
+            'playht_api_key': session.get('playht_api_key'),
+            'video_profile': video_profile_name,
+            'pipeline_mode': app.config['PIPELINE_MODE'],
+        })
+
+        # the new job is queued: the session's previous one can go
+        clean_finished_job(previous_job_id)
 
         return jsonify({
             'msg': 'successfuly uploaded',
         })
     except Exception as e:
         print(f"Error during upload: {str(e)}")
+        if job_queue.get(unique_id) is None:
+            workspace.remove()
         return jsonify({'error': str(e)}), 500
 
 def get_voice_id(audio_path, api_key, user_id):
@@ -623,39 +1402,80 @@ def get_voice_id(audio_path, api_key, user_id):
     voice_id = response_data.get("id")
     return voice_id
 
+def playht_voice_exists(voice_id, api_key, user_id):
+    """Whether the user's Play.ht account still has the cloned voice; None if Play.ht can't tell us."""
+    headers = {
+        "accept": "application/json",
+        "AUTHORIZATION": api_key,
+        "X-USER-ID": user_id
+    }
+    try:
+        response = requests.get("https://api.play.ht/api/v2/cloned-voices", headers=headers, timeout=10)
+        response.raise_for_status()
+        return any(voice.get("id") == voice_id for voice in response.json())
+    except Exception as e:
+        print(f"Could not validate voice {voice_id}: {e}")
+        return None
+
+def get_cached_voice_id(audio_path, api_key, user_id):
+    """
+    Clone ID for a voice sample, cloning it only the first time a user uploads it.
+    A registered clone older than VOICE_REVALIDATE_HOURS is checked against Play.ht
+    and re-cloned if it is gone (kept if Play.ht can't be reached).
+    """
+    sample_hash = file_digest(audio_path)
+    entry = voice_registry.get(user_id, sample_hash)
+    if entry:
+        voice_id, validated_at = entry
+        if time.time() - validated_at < app.config['VOICE_REVALIDATE_HOURS'] * 3600:
+            return voice_id
+        exists = playht_voice_exists(voice_id, api_key, user_id)
+        if exists is not False:
+            if exists:
+                voice_registry.mark_validated(user_id, sample_hash)
+            return voice_id
+        voice_registry.forget(user_id, sample_hash)
+
+    voice_id = get_voice_id(audio_path, api_key, user_id)
+    if voice_id:
+        voice_registry.put(user_id, sample_hash, voice_id)
+    return voice_id
+
 @app.route('/upload_progress')
 def upload_progress():
+    """Relay the session's job progress as SSE; the job itself runs in a worker process."""
+    job_id = session.get('job_id')
     pdf_path = session.get('pdf_path')
-    output_path = session.get('output_path')
     video_filename = session.get('video_filename')
-    custom_voice_id = session.get('custom_voice_id')
     api_key = session.get('api_key')
-    playht_user_id = session.get('playht_user_id') 
-    playht_api_key = session.get('playht_api_key') 
     def generate():
+        after = 0
+        started = time.time()
         try:
-            # PDF to images
-            yield "data: 1\n\n"
-            images = convert_pdf_to_images(pdf_path)
-            if images < 10:
-                time.sleep(2)
-            # create scripts for each image
-            yield "data: 2\n\n"
-            scripts = generate_scripts_for_images("output/images", api_key)
-
-            yield "data: 3\n\n"
-            generate_audio_files(scripts, api_key, custom_voice_id, playht_api_key, playht_user_id)
-
-            # produce final video
-            yield "data: 4\n\n"
-            create_video_ffmpeg("output/images", "output/audio", output_path)
-            yield "data: 5\n\n"
-
-            if not os.path.exists(output_path):
-                raise RuntimeError(f"Video was not created at {output_path}")
-            
-            # setup QA system with the generated scripts
-            setup_qa_for_chat(scripts, api_key)
+            while True:
+                job = job_queue.get(job_id) if job_id else None
+                if job is None:
+                    raise RuntimeError("No upload in progress")
+                for seq, data in job_queue.events(job_id, after):
+                    after = seq
+                    yield f"data: {data}\n\n"
+                if job['status'] == 'failed':
+                    return  # its error event has just been sent
+                if job['status'] == 'done':
+                    break
+                # don't hold a request thread for a job nobody is running
+                if job_queue.is_stale(job):
+                    raise RuntimeError("The worker running this upload stopped responding; it will be retried")
+                if time.time() - started > app.config['JOB_PROGRESS_TIMEOUT_SECONDS']:
+                    raise RuntimeError("Timed out waiting for the upload to finish")
+                time.sleep(app.config['JOB_POLL_SECONDS'])
+
+            # load the lecture's chat state now, so the first question doesn't wait on it;
+            # the video is done either way, and /ask retries the load
+            try:
+                qa_lectures.get(job_id, api_key)
+            except Exception as e:
+                print(f"Warning: QA setup for job {job_id} failed: {str(e)}")
             
             # video URL used by the frontend
             video_url = f"/api/static/{video_filename}"
@@ -669,6 +1489,51 @@ def upload_progress():
         
     return Response(generate(), mimetype='text/event-stream')
 
+@app.route("/resume_job", methods=["POST", "OPTIONS"])
+def resume_job():
+    """
+    Re-run the session's failed (or finished) job. Slides whose checkpoints are still
+    valid are reused, so only the missing or invalidated steps are redone; progress is
+    then available from /upload_progress as usual.
+    """
+    if request.method == "OPTIONS":
+        return jsonify({"success": True}), 200
+
+    api_key = session.get('api_key')
+    if not api_key:
+        return jsonify({"error": "API key not set"}), 401
+
+    job_id = session.get('job_id')
+    job = job_queue.get(job_id) if job_id else None
+    if job is None:
+        return jsonify({"error": "No job to resume"}), 404
+    if job['status'] in ('queued', 'running'):
+        return jsonify({"error": "Job is still in progress"}), 409
+
+    checkpoints = SlideManifest(os.path.join(job_workspace(job_id).path, 'manifest.json')).status()
+    # the keys were wiped when the job finished; checkpoints live in the streaming pipeline
+    job_queue.requeue(job_id, {
+        'api_key': api_key,
+        'playht_user_id': session.get('playht_user_id'),
+        'playht_api_key': session.get('playht_api_key'),
+        'pipeline_mode': 'streaming',
+    })
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "checkpointed_slides": sum(1 for stages in checkpoints.values() if 'segment' in stages),
+    })
+
+@app.route("/cache_stats", methods=["GET"])
+def cache_stats():
+    """Hit/miss counters and sizes of the persistent caches."""
+    return jsonify({
+        "scripts": script_cache.stats(),
+        # this process's loaded chat indexes
+        "qa_indexes": lecture_indexes.stats(),
+        "qa_lectures": qa_lectures.stats(),
+    })
+
 @app.route("/download_video", methods=["GET"])
 def download_video():
     if "api_key" not in session:
@@ -693,14 +1558,9 @@ def clear_session():
     if request.method == "OPTIONS":
         return jsonify({"success": True}), 200
     
+    # remove this session's job files; other jobs keep running
+    clean_finished_job(session.get('job_id'))
     session.clear()
-    # remove all leftover files.
-    clean_directories(keep_video=None)
-
-    global qa_chain, content_filter, scripts_global
-    qa_chain = None
-    content_filter = None
-    scripts_global = None
     
     return jsonify({"success": True, "message": "Session cleared successfully"})
 
@@ -728,31 +1588,28 @@ def ask():
     if not api_key:
         return jsonify({"error": "API key not set"}), 401
     
-    global qa_chain, content_filter
-    
     data = request.get_json() or {}
     user_question = data.get("question", "").strip()
     if not user_question:
         return jsonify({"error": "Question cannot be empty"}), 400
     
+    # any finished lecture can be asked about by id; by default the session's own
+    lecture_id = data.get("lecture_id") or session.get('job_id')
+    lecture = qa_lectures.get(lecture_id, api_key) if lecture_id else None
+    if lecture is None:
+        return jsonify({"error": "QA system not initialized."}), 400
+
     # content_filter check
-    if content_filter and not content_filter(user_question):
+    if not lecture.allows(user_question, session.get('qa_threshold', 0.04)):
         return jsonify({
             "error": "I can only answer questions related to the lecture content."
         }), 400
 
-    if not qa_chain:
-        return jsonify({"error": "QA system not initialized."}), 400
-
     try:
-        # ensure QA chain has updated safety instructions
-        if scripts_global:
-            safety_instructions = session.get('safety_instructions')
-            if safety_instructions:
-                setup_qa_for_chat(scripts_global, api_key, safety_instructions)
-        
-        answer = qa_chain.invoke(user_question)
-        return jsonify({"success": True, "answer": answer})
+        # chains are kept per safety instructions, so settings changes never touch the index
+        result = lecture.chain(api_key, session.get('safety_instructions')).invoke(user_question)
+        return jsonify({"success": True, "answer": result["answer"],
+                        "sources": answer_sources(result["docs"], lecture.video_url)})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -777,35 +1634,112 @@ def update_qa_settings():
     # store in session
     session['qa_threshold'] = threshold
     session['safety_instructions'] = safety_instructions
-    
-    # update the QA chain with new safety instructions
-    global qa_chain, content_filter, scripts_global
-    if scripts_global:
-        content_filter = create_content_filter(scripts_global, threshold)
-        setup_qa_for_chat(scripts_global, session.get('api_key'), safety_instructions)
+    # /ask applies both per question; the lecture's index and TF-IDF fit are shared as is
     
     return jsonify({"success": True, "message": "QA settings updated"})
 
-def setup_qa_for_chat(scripts, api_key, safety_instructions=None):
-    """Sets up a simple QA system using a vectorstore + OpenAI."""
-    global qa_chain, content_filter, scripts_global
+def load_lecture_qa(lecture_id, api_key):
+    """
+    Chat state of a finished job's lecture, for qa_lectures. Its index is made sure of
+    (see lecture_store) but not kept: only lecture_indexes holds loaded stores.
+    None if the job isn't done or its video has expired.
+    """
+    job = job_queue.get(lecture_id)
+    if job is None or job['status'] != 'done' or not os.path.exists(job['params']['output_path']):
+        return None
+    print(f"[QA Setup] Loading lecture {lecture_id}")
+
+    output_path = job['params']['output_path']
+    scripts = job['result']['scripts']
+    lecture_store(lecture_id, lecture_index_dir(output_path), scripts, api_key)
 
-    print(f"[QA Setup] Setting up QA chain with safety instructions: {bool(safety_instructions)}")
-    
-    scripts_global = scripts
     try:
-        threshold = session.get('qa_threshold', 0.04)
-        print(f"[QA Setup] Creating content filter with threshold: {threshold}")
-        content_filter = create_content_filter(scripts, threshold)
+        content_filter = create_content_filter(scripts)
     except Exception as e:
         print(f"Warning: Content filter creation failed: {str(e)}")
-        content_filter = lambda _: True
-    
-    # retrieval QA
-    embeddings = OpenAIEmbeddings(api_key=api_key)
-    vector_store = FAISS.from_texts(scripts, embeddings)
-    retriever = vector_store.as_retriever(search_kwargs={"k": 3})
-    llm = OpenAI(api_key=api_key)
+        content_filter = None
+
+    video_url = f"/api/static/{os.path.relpath(output_path, os.path.abspath('static'))}"
+    return LectureQA(lecture_id, lecture_index_dir(output_path), scripts, content_filter, lecture_chain,
+                     max_chains=app.config['QA_MAX_CHAINS'], video_url=video_url)
+
+def lecture_store(lecture_id, index_dir, scripts, api_key):
+    """
+    A lecture's FAISS store from lecture_indexes, bound to the asking user's embeddings
+    client. Jobs finished before indexes were saved are embedded once, here.
+    """
+    store = lecture_indexes.get(index_dir, lecture_embeddings(api_key))
+    if store is None:
+        if not os.path.isdir(os.path.dirname(index_dir)):
+            raise RuntimeError("The lecture video has expired.")
+        workspace = job_workspace(lecture_id)
+        audio_dir = workspace.dir('audio')
+        timeline = slide_timeline(audio_dir, workspace.dir('segments')) if os.path.isdir(audio_dir) else None
+        store = build_lecture_index(scripts, api_key, timeline)
+        save_lecture_index(store, index_dir)
+        lecture_indexes.put(index_dir, store)
+    return store
+
+def lecture_chain(lecture, api_key, safety_instructions=None):
+    """
+    QA chain over a lecture. The store is fetched from lecture_indexes for every question
+    rather than held by the chain, so cached chains never keep an evicted index alive.
+    """
+    def retrieve(question):
+        store = lecture_store(lecture.lecture_id, lecture.index_dir, lecture.scripts, api_key)
+        return store.similarity_search(question, k=app.config['QA_RETRIEVE_K'])
+    return build_qa_chain(RunnableLambda(retrieve), api_key, safety_instructions)
+
+def lecture_index_dir(video_path):
+    """Where a video's chat index is kept: next to it, so it expires with it."""
+    return f"{os.path.splitext(video_path)[0]}.index"
+
+def lecture_embeddings(api_key):
+    return OpenAIEmbeddings(api_key=api_key, http_client=get_http_client(api_key))
+
+def slide_timeline(audio_dir, segments_dir=None):
+    """
+    {slide: (start, duration)} in the video, for the narrated slides in audio_dir, joined
+    in order. Each slide lasts as long as its encoded segment in segments_dir: the video
+    track rounds up to whole frames, and the concat demuxer starts every segment where
+    the previous one ends, so summing the audio alone drifts further with every slide.
+    Segment durations are the ones measured when they were encoded; only segments from
+    before those were kept are probed. Without a segment (VIDEO_MODE 'single') the audio
+    duration is used.
+    """
+    slides = sorted(int(re.search(r'slide_(\d+)', f).group(1))
+                    for f in os.listdir(audio_dir) if re.fullmatch(r'slide_\d+\.mp3', f))
+    timeline = {}
+    elapsed = 0.0
+    for slide_number in slides:
+        segment = os.path.join(segments_dir, f"slide_{slide_number}.mp4") if segments_dir else None
+        if segment and os.path.exists(segment):
+            duration = stored_segment_duration(segment)
+            if duration is None:
+                duration = ffprobe_duration(segment)
+        else:
+            duration = get_audio_duration(os.path.join(audio_dir, f"slide_{slide_number}.mp3"))
+        timeline[slide_number] = (elapsed, duration)
+        elapsed += duration
+    return timeline
+
+def build_lecture_index(scripts, api_key, timeline=None):
+    """
+    Embed the lecture as overlapping passages tagged with their slide (and, given the
+    slide timeline, their time in the video) - the only costly step of QA setup.
+    """
+    texts, metadatas = lecture_passages(scripts, timeline, app.config['QA_PASSAGE_TOKENS'],
+                                        app.config['QA_PASSAGE_OVERLAP_TOKENS'])
+    return FAISS.from_texts(texts, lecture_embeddings(api_key), metadatas=metadatas)
+
+def build_qa_chain(retriever, api_key, safety_instructions=None):
+    """
+    Retrieval QA chain over a retriever (question -> docs); cheap enough to rebuild on every settings change.
+    Invoked with the question, it returns {"question", "docs", "answer"}: docs are the
+    passages that were put in the prompt, within QA_CONTEXT_TOKENS.
+    """
+    context_tokens = app.config['QA_CONTEXT_TOKENS']
+    llm = OpenAI(api_key=api_key, http_client=get_http_client(api_key))
     
     base_prompt = """
 You are an expert lecturer. Below is some context from the lecture:
@@ -827,49 +1761,91 @@ If the question requires further explanation beyond what is in the provided lect
     
     prompt = ChatPromptTemplate.from_template(base_prompt)
     
-    chain = (
-        {"context": retriever | format_docs, "question": RunnablePassthrough()}
+    answer = (
+        {"context": lambda inputs: format_passages(inputs["docs"]), "question": lambda inputs: inputs["question"]}
         | prompt
         | llm
         | StrOutputParser()
     )
-    qa_chain = chain
+    chain = (
+        {"docs": retriever | (lambda docs: fit_passages(docs, context_tokens)), "question": RunnablePassthrough()}
+        | RunnablePassthrough.assign(answer=answer)
+    )
     print("[QA Setup] QA chain setup complete")
+    return chain
 
-def create_content_filter(scripts, threshold=0.04):
-    """Create a more robust content filter that checks if user queries match the lecture content."""
-    combined_text = " ".join(scripts)
-    vectorizer = TfidfVectorizer(
-        stop_words='english',
-        ngram_range=(1, 2),
-        min_df=1,
-        max_df=1.0,
-        lowercase=True,
-        strip_accents='unicode'
-    )
-    texts_to_fit = scripts + [combined_text]
-    vectorizer.fit(texts_to_fit)
-    
-    def filter_func(question):
+class ContentFilter:
+    """
+    Checks whether questions relate to the lecture. The TF-IDF vectorizer is fitted and
+    the corpus (every script plus the whole lecture) transformed once; rows are
+    L2-normalized, so scoring a batch of questions is a single sparse product.
+    """
+
+    def __init__(self, scripts, threshold=0.04):
+        self.threshold = threshold
+        self.vectorizer = TfidfVectorizer(
+            stop_words='english',
+            ngram_range=(1, 2),
+            min_df=1,
+            max_df=1.0,
+            lowercase=True,
+            strip_accents='unicode',
+            norm='l2'
+        )
+        texts_to_fit = scripts + [" ".join(scripts)]
+        # (vocabulary x texts), so questions @ corpus gives every cosine similarity
+        self.corpus = self.vectorizer.fit_transform(texts_to_fit).T.tocsr()
+
+    def with_threshold(self, threshold):
+        """The same fitted filter with another threshold (shares the vectorizer and corpus)."""
+        content_filter = copy.copy(self)
+        content_filter.threshold = threshold
+        return content_filter
+
+    def scores(self, questions):
+        """Highest cosine similarity of each question to any lecture text."""
+        question_tfidf = self.vectorizer.transform([question.strip().lower() for question in questions])
+        return (question_tfidf @ self.corpus).max(axis=1).toarray().ravel()
+
+    def batch(self, questions):
+        """Filter out questions that are not related to the lecture content, for many questions at once."""
+        try:
+            sims = self.scores(questions)
+        except Exception as e:
+            print(f"Content filter error: {str(e)}")
+            return [bool(question.strip()) for question in questions]
+        return [bool(question.strip()) and bool(sim > self.threshold) for question, sim in zip(questions, sims)]
+
+    def __call__(self, question):
         """Filter out questions that are not related to the lecture content."""
         try:
             question = question.strip().lower()
             if not question:
                 return False
-            question_tfidf = vectorizer.transform([question])
-            texts_tfidf = vectorizer.transform(texts_to_fit)
-            sims = cosine_similarity(question_tfidf, texts_tfidf).flatten()
-            max_sim = np.max(sims)
+            max_sim = self.scores([question])[0]
             print(f"[ContentFilter] Max similarity = {max_sim:.4f} for question '{question}'")
-            return max_sim > threshold
+            return max_sim > self.threshold
         except Exception as e:
             print(f"Content filter error: {str(e)}")
-            return True  
-
-    return filter_func
+            return True
 
-def format_docs(docs):
-    return "\n\n".join([d.page_content for d in docs])
+def create_content_filter(scripts, threshold=0.04):
+    """Create a more robust content filter that checks if user queries match the lecture content."""
+    return ContentFilter(scripts, threshold)
+
+def answer_sources(docs, video_url):
+    """Slides (and video times, with a link that starts playback there) an answer drew on."""
+    sources = []
+    for doc in docs:
+        metadata = doc.metadata
+        if 'slide' not in metadata or any(source['slide'] == metadata['slide'] for source in sources):
+            continue
+        source = {"slide": metadata['slide']}
+        if 'start' in metadata:
+            source.update(start=metadata['start'], time=timestamp(metadata['start']),
+                          link=f"{video_url}#t={metadata['start']:.1f}")
+        sources.append(source)
+    return sources
 
 @app.route('/static/<path:filename>')
 def serve_static(filename):
@@ -877,4 +1853,6 @@ def serve_static(filename):
 
 if __name__ == '__main__':
     setup_directories()
+    job_queue.requeue_orphans()  # jobs whose worker died with the last server
+    start_workers(app.config['JOB_WORKERS'], job_worker)
     app.run(host='0.0.0.0', port=8080)
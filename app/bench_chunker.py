@@ -0,0 +1,75 @@
+# bench_chunker.py
+
+import re
+import glob
+import time
+import argparse
+import statistics
+
+from text_chunker import TTS_CHAR_LIMITS, split_text_into_chunks
+
+
+def legacy_split(text, max_lines=6, max_chars=500):
+    """The original splitter, on bracketed timestamps only, for comparison."""
+    lines = re.split(r'(?<=\]) ', text)
+    chunks = []
+    chunk = []
+    char_count = 0
+    for line in lines:
+        if char_count + len(line) <= max_chars and len(chunk) < max_lines:
+            chunk.append(line)
+            char_count += len(line)
+        else:
+            chunks.append(" ".join(chunk))
+            chunk = [line]
+            char_count = len(line)
+    if chunk:
+        chunks.append(" ".join(chunk))
+    return chunks
+
+
+def measure(splitter, scripts, max_chars, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        chunked = [splitter(script, max_chars=max_chars) for script in scripts]
+    seconds = (time.perf_counter() - start) / repeat
+    sizes = [len(chunk) for chunks in chunked for chunk in chunks]
+    # spread within a slide is what makes its parallel chunks finish unevenly
+    spreads = [statistics.pstdev(len(chunk) for chunk in chunks) for chunks in chunked if len(chunks) > 1]
+    return {
+        'chunks': len(sizes),
+        'mean': statistics.mean(sizes) if sizes else 0,
+        'stdev': statistics.mean(spreads) if spreads else 0,
+        'over': sum(size > max_chars for size in sizes),
+        'empty': sum(not chunk.strip() for chunks in chunked for chunk in chunks),
+        'scripts/s': len(scripts) / seconds if seconds else float('inf'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare TTS chunkers on archived slide scripts")
+    parser.add_argument("--scripts", nargs="+", default=["output/jobs/*/scripts/*.txt", "output/scripts/*.txt"],
+                        help="Glob patterns of slide_N_script.txt files")
+    parser.add_argument("--engine", choices=list(TTS_CHAR_LIMITS), default="Play3.0-mini")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    paths = sorted({path for pattern in args.scripts for path in glob.glob(pattern)})
+    scripts = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            scripts.append(f.read())
+    if not scripts:
+        parser.error("no scripts found")
+
+    max_chars = TTS_CHAR_LIMITS[args.engine]
+    print(f"{len(scripts)} scripts, {sum(map(len, scripts))} chars, limit {max_chars} ({args.engine})")
+    print(f"\n{'chunker':<10} {'chunks':>7} {'mean':>7} {'stdev':>7} {'over':>5} {'empty':>6} {'scripts/s':>10}")
+    for name, splitter in [('legacy', legacy_split), ('balanced', split_text_into_chunks)]:
+        r = measure(splitter, scripts, max_chars, args.repeat)
+        print(f"{name:<10} {r['chunks']:>7} {r['mean']:>7.0f} {r['stdev']:>7.1f} {r['over']:>5} {r['empty']:>6} "
+              f"{r['scripts/s']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
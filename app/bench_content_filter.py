@@ -0,0 +1,63 @@
+# bench_content_filter.py
+
+import time
+import random
+import argparse
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from app import create_content_filter
+
+WORDS = ("algorithm graph node edge weight distance neighbour tree search sort merge heap "
+         "queue stack hash table vector matrix gradient loss model layer training data "
+         "complexity recursion dynamic programming greedy network memory cache").split()
+
+
+def legacy_filter(scripts, threshold=0.04):
+    """The original filter, which re-transforms the whole corpus for every question."""
+    vectorizer = TfidfVectorizer(stop_words='english', ngram_range=(1, 2), min_df=1, max_df=1.0,
+                                 lowercase=True, strip_accents='unicode')
+    texts_to_fit = scripts + [" ".join(scripts)]
+    vectorizer.fit(texts_to_fit)
+
+    def filter_func(question):
+        question_tfidf = vectorizer.transform([question.strip().lower()])
+        texts_tfidf = vectorizer.transform(texts_to_fit)
+        return cosine_similarity(question_tfidf, texts_tfidf).flatten().max() > threshold
+    return filter_func
+
+
+def lecture(slides, words_per_slide=150):
+    return [" ".join(random.choice(WORDS) for _ in range(words_per_slide)) for _ in range(slides)]
+
+
+def per_question_ms(check, questions):
+    start = time.perf_counter()
+    for question in questions:
+        check(question)
+    return (time.perf_counter() - start) * 1000 / len(questions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-question latency of the content filter as lectures grow")
+    parser.add_argument("--slides", nargs="+", type=int, default=[10, 50, 200, 1000])
+    parser.add_argument("--questions", type=int, default=50)
+    args = parser.parse_args()
+
+    random.seed(0)
+    questions = [" ".join(random.choice(WORDS) for _ in range(8)) + "?" for _ in range(args.questions)]
+    print(f"{'slides':>7} {'legacy ms':>10} {'single ms':>10} {'batch ms':>9}")
+    for slides in args.slides:
+        scripts = lecture(slides)
+        content_filter = create_content_filter(scripts)
+        legacy = per_question_ms(legacy_filter(scripts), questions)
+        single = per_question_ms(lambda q: content_filter.batch([q]), questions)
+        start = time.perf_counter()
+        content_filter.batch(questions)
+        batch = (time.perf_counter() - start) * 1000 / len(questions)
+        print(f"{slides:>7} {legacy:>10.2f} {single:>10.2f} {batch:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# bench_video_profiles.py
+
+import os
+import time
+import argparse
+import tempfile
+
+from app import app, create_video_ffmpeg, job_workspace
+from file_cache import FileCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare encode time and output size of the video profiles")
+    parser.add_argument("--job", help="Id of a job whose workspace holds the frames and audio")
+    parser.add_argument("--images", help="Directory of page_N images (default: the job's frames)")
+    parser.add_argument("--audio", help="Directory of slide_N.mp3 files (default: the job's audio)")
+    parser.add_argument("--profiles", nargs="+", default=list(app.config['VIDEO_PROFILES']))
+    parser.add_argument("--modes", nargs="+", default=["single", "segments"])
+    args = parser.parse_args()
+
+    if args.job:
+        workspace = job_workspace(args.job)
+        args.images = args.images or workspace.renditions(app.config['RENDITIONS'])['frame']['dir']
+        args.audio = args.audio or workspace.dir('audio')
+    if not (args.images and args.audio):
+        parser.error("pass --job, or both --images and --audio")
+
+    no_cache = FileCache(tempfile.mkdtemp(), 0)  # always encode
+    results = []
+    with tempfile.TemporaryDirectory() as out_dir:
+        for mode in args.modes:
+            for profile in args.profiles:
+                output_path = os.path.join(out_dir, f"{mode}_{profile}.mp4")
+                start = time.perf_counter()
+                create_video_ffmpeg(args.images, args.audio, output_path, mode=mode, profile=profile, cache=no_cache,
+                                    segments_dir=os.path.join(out_dir, f"{mode}_{profile}_segments"))
+                results.append((mode, profile, time.perf_counter() - start, os.path.getsize(output_path)))
+
+    print(f"\n{'mode':<10} {'profile':<10} {'encode s':>9} {'size MB':>9}")
+    for mode, profile, seconds, size in results:
+        print(f"{mode:<10} {profile:<10} {seconds:>9.2f} {size / 1e6:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# file_cache.py
+
+import os
+import shutil
+import uuid
+
+
+class FileCache:
+    """
+    Content-addressed, size-bounded on-disk store for pipeline artifacts.
+
+    Entries are plain files named <key><extension>, sharded by the first two key
+    characters. Recency is tracked through file mtimes, so any number of processes
+    can share one cache directory without a lock or an index file.
+    Files are hardlinked in and out of the cache when the filesystem allows it, so
+    callers must replace (unlink + write) a served file rather than rewrite it in place.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def path_for(self, key, extension=''):
+        return os.path.join(self.root, key[:2], f"{key}{extension}")
+
+    def get(self, key, extension, dest):
+        """Place the cached entry at dest. Returns False on a miss."""
+        if not self.enabled:
+            return False
+        path = self.path_for(key, extension)
+        try:
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            return False
+        if os.path.lexists(dest):
+            os.remove(dest)
+        try:
+            os.link(path, dest)
+        except FileNotFoundError:
+            return False  # evicted between the utime and the link
+        except OSError:
+            shutil.copyfile(path, dest)
+        return True
+
+    def put(self, key, extension, src):
+        """Store a copy of src under key (atomically, so readers never see partial files)."""
+        if not self.enabled:
+            return
+        path = self.path_for(key, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.link(src, tmp_path)
+        except OSError:
+            shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, path)
+
+    def evict(self):
+        """Drop least-recently-used entries until the cache fits in max_bytes."""
+        if not os.path.isdir(self.root):
+            return 0
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
@@ -1,6 +1,6 @@
 'use client';
 
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { ArrowUpTrayIcon, ChatBubbleLeftIcon, VideoCameraIcon, KeyIcon, SunIcon, MoonIcon, Cog6ToothIcon, ArrowUpIcon  } from '@heroicons/react/24/outline';
 
 // API configuration
@@ -39,6 +39,8 @@ export default function Home() {
   const [error, setError] = useState('');
   const [question, setQuestion] = useState('');
   const [answer, setAnswer] = useState('');
+  const [sources, setSources] = useState<{ slide: number; start?: number; time?: string }[]>([]);
+  const videoRef = useRef<HTMLVideoElement>(null);
   const [showChat, setShowChat] = useState(false);
   const [isDarkMode, setIsDarkMode] = useState(true);
   const [showSettings, setShowSettings] = useState(false);
@@ -228,6 +230,12 @@ export default function Home() {
     };
   };
 
+  const seekTo = (seconds: number) => {
+    if (!videoRef.current) return;
+    videoRef.current.currentTime = seconds;
+    videoRef.current.play();
+  };
+
   const handleAskQuestion = async (e: React.FormEvent) => {
     e.preventDefault();
     if (!question.trim()) return;
@@ -247,6 +255,7 @@ export default function Home() {
 
       const data = await response.json();
       setAnswer(data.answer);
+      setSources(data.sources || []);
     } catch (error) {
       setError(error instanceof Error ? error.message : 'Error getting answer');
     } finally {
@@ -662,6 +671,7 @@ export default function Home() {
                           setFile(null);
                           setQuestion('');
                           setAnswer('');
+                          setSources([]);
                           setIsChecked(false)
                           setPdfFileName('')
                           setAudioFileName('')
@@ -680,6 +690,7 @@ export default function Home() {
                           setFile(null);
                           setQuestion('');
                           setAnswer('');
+                          setSources([]);
                           // Clear session
                           fetch(`${API_CONFIG.baseURL}/clear_session`, getFetchOptions('POST'));
                         }}
@@ -702,6 +713,7 @@ export default function Home() {
                   {videoUrl && (
                     <div className="relative aspect-video w-full bg-gray-900 rounded-lg overflow-hidden">
                       <video 
+                        ref={videoRef}
                         controls 
                         className="w-full h-full"
                         src={videoUrl} // update video source
@@ -734,6 +746,21 @@ export default function Home() {
                   {answer && (
                     <div className="bg-gray-100 dark:bg-gray-700/50 rounded-lg p-4 mb-4">
                       <p className="text-gray-700 dark:text-gray-300">{answer}</p>
+                      {sources.length > 0 && (
+                        <div className="flex flex-wrap gap-2 mt-3">
+                          {sources.map((source) => (
+                            <button
+                              key={source.slide}
+                              type="button"
+                              onClick={() => source.start !== undefined && seekTo(source.start)}
+                              disabled={source.start === undefined}
+                              className="text-xs px-2 py-1 rounded bg-gray-200 dark:bg-gray-600 text-gray-700 dark:text-gray-200 hover:bg-gray-300 dark:hover:bg-gray-500 disabled:cursor-default"
+                            >
+                              Slide {source.slide}{source.time ? ` · ${source.time}` : ''}
+                            </button>
+                          ))}
+                        </div>
+                      )}
                     </div>
                   )}
                   
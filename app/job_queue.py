@@ -0,0 +1,180 @@
+# job_queue.py
+
+import os
+import json
+import time
+import sqlite3
+import threading
+import contextlib
+import multiprocessing
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue shared by the web process and the worker processes.
+    Jobs move queued -> running -> done | failed; each one has an append-only list
+    of progress events that SSE handlers poll. Parameters named in `secret_params`
+    (API keys) are wiped from the database once a job finishes. Workers refresh a
+    running job's updated_at every `heartbeat_interval` seconds; one not refreshed for
+    `stale_after` seconds has lost its worker.
+    """
+
+    def __init__(self, db_path, secret_params=(), heartbeat_interval=15, stale_after=120):
+        self.db_path = db_path
+        self.secret_params = secret_params
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                params TEXT NOT NULL,
+                result TEXT,
+                worker_pid INTEGER,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )""")
+            db.execute("""CREATE TABLE IF NOT EXISTS events (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                data TEXT NOT NULL
+            )""")
+            db.execute("CREATE INDEX IF NOT EXISTS events_job ON events (job_id, seq)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)  # autocommit
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def _job(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def enqueue(self, job_id, params):
+        now = time.time()
+        with self._connect() as db:
+            db.execute("INSERT INTO jobs (id, status, params, created_at, updated_at) VALUES (?, 'queued', ?, ?, ?)",
+                       (job_id, json.dumps(params), now, now))
+
+    def claim(self, worker_pid):
+        """Atomically take the oldest queued job and mark it running. Returns None if there is none."""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+                if row is not None:
+                    db.execute("UPDATE jobs SET status = 'running', worker_pid = ?, updated_at = ? WHERE id = ?",
+                               (worker_pid, time.time(), row['id']))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        job = self._job(row)
+        if job:
+            job['status'] = 'running'
+        return job
+
+    def publish(self, job_id, data):
+        with self._connect() as db:
+            db.execute("INSERT INTO events (job_id, data) VALUES (?, ?)", (job_id, str(data)))
+            db.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def events(self, job_id, after=0):
+        """[(seq, data)] of the job's events newer than `after`."""
+        with self._connect() as db:
+            return [(row['seq'], row['data']) for row in
+                    db.execute("SELECT seq, data FROM events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after))]
+
+    def finish(self, job_id, status, result=None):
+        with self._connect() as db:
+            row = db.execute("SELECT params FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            params = {k: v for k, v in json.loads(row['params']).items() if k not in self.secret_params} if row else {}
+            db.execute("UPDATE jobs SET status = ?, result = ?, params = ?, updated_at = ? WHERE id = ?",
+                       (status, json.dumps(result), json.dumps(params), time.time(), job_id))
+
+    def requeue(self, job_id, params):
+        """Queue a finished job again with `params` merged in, dropping its old events."""
+        with self._connect() as db:
+            row = db.execute("SELECT params FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return False
+            db.execute("DELETE FROM events WHERE job_id = ?", (job_id,))
+            db.execute("UPDATE jobs SET status = 'queued', params = ?, result = NULL, worker_pid = NULL, updated_at = ? "
+                       "WHERE id = ?", (json.dumps({**json.loads(row['params']), **params}), time.time(), job_id))
+        return True
+
+    def get(self, job_id):
+        with self._connect() as db:
+            return self._job(db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def heartbeat(self, job_id, worker_pid):
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET updated_at = ? WHERE id = ? AND status = 'running' AND worker_pid = ?",
+                       (time.time(), job_id, worker_pid))
+
+    def is_stale(self, job):
+        """Whether a running job's worker has stopped sending heartbeats."""
+        return job['status'] == 'running' and time.time() - job['updated_at'] > self.stale_after
+
+    def requeue_orphans(self):
+        """
+        Put running jobs whose worker stopped sending heartbeats (it died, or its host did)
+        back in the queue. Safe to call from every process, as often as needed.
+        """
+        with self._connect() as db:
+            requeued = db.execute("UPDATE jobs SET status = 'queued', worker_pid = NULL, updated_at = ? "
+                                  "WHERE status = 'running' AND updated_at < ?",
+                                  (time.time(), time.time() - self.stale_after)).rowcount
+        if requeued:
+            print(f"[JobQueue] requeued {requeued} job(s) whose worker stopped responding")
+        return requeued
+
+    def work(self, handler, poll_interval=1.0):
+        """
+        Worker loop: run handler(job, publish) for each claimed job, forever.
+        The handler's return value is stored as the job result; an exception fails
+        the job after publishing an "Error: ..." event.
+        """
+        while True:
+            job = self.claim(os.getpid())
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+            done = threading.Event()
+            threading.Thread(target=self._beat, args=(job['id'], done), daemon=True).start()
+            try:
+                result = handler(job, lambda data: self.publish(job['id'], data))
+                self.finish(job['id'], 'done', result)
+            except Exception as e:
+                self.publish(job['id'], f"Error: {e}--{job['params'].get('pdf_path')}")
+                self.finish(job['id'], 'failed', {'error': str(e)})
+            finally:
+                done.set()
+
+    def _beat(self, job_id, done):
+        while not done.wait(self.heartbeat_interval):
+            try:
+                self.heartbeat(job_id, os.getpid())
+            except sqlite3.Error as e:
+                print(f"[JobQueue] heartbeat for {job_id} failed: {e}")
+
+
+def start_workers(count, target):
+    """Start `count` worker processes running target(). They spawn render pools, so they aren't daemonic."""
+    processes = []
+    for n in range(count):
+        process = multiprocessing.Process(target=target, name=f"job-worker-{n + 1}")
+        process.start()
+        processes.append(process)
+    return processes
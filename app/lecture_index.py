@@ -0,0 +1,95 @@
+# lecture_index.py
+
+import os
+import pickle
+import shutil
+import threading
+from collections import OrderedDict
+
+import faiss
+from langchain_community.vectorstores import FAISS
+
+
+def save_lecture_index(vector_store, index_dir):
+    """Serialize a lecture's FAISS store (index.faiss + index.pkl) into index_dir."""
+    tmp_dir = f"{index_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    vector_store.save_local(tmp_dir)
+    shutil.rmtree(index_dir, ignore_errors=True)
+    os.rename(tmp_dir, index_dir)
+
+
+def read_lecture_index(index_dir):
+    """
+    (faiss index, docstore, index_to_docstore_id) of a saved store. The vectors are
+    memory-mapped where the index type supports it, so idle lectures cost page cache only.
+    """
+    index_path = os.path.join(index_dir, "index.faiss")
+    try:
+        index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        index = faiss.read_index(index_path)
+    # our own files, written by save_lecture_index
+    with open(os.path.join(index_dir, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return index, docstore, index_to_docstore_id
+
+
+def lecture_texts(docstore, index_to_docstore_id):
+    """The indexed texts, in index order (the slide scripts, for indexes built from them)."""
+    return [docstore.search(index_to_docstore_id[i]).page_content for i in sorted(index_to_docstore_id)]
+
+
+class LectureIndexCache:
+    """
+    LRU of loaded lecture indexes keyed by directory, bounded by an estimate of their
+    memory (vectors + texts). The parts are shared; each caller gets its own FAISS
+    wrapper bound to its own embeddings client.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # index_dir -> (parts, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _size(index, docstore, index_to_docstore_id):
+        texts = lecture_texts(docstore, index_to_docstore_id)
+        return index.ntotal * index.d * 4 + sum(len(text.encode("utf-8")) for text in texts)
+
+    def _insert(self, index_dir, parts):
+        """Add (or refresh) an entry and evict the least recently used ones over budget."""
+        size = self._size(*parts)
+        with self._lock:
+            if index_dir in self._entries:
+                self._bytes -= self._entries.pop(index_dir)[1]
+            self._entries[index_dir] = (parts, size)
+            self._bytes += size
+            # always keep the newest lecture, even if it alone exceeds the budget
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def get(self, index_dir, embeddings):
+        """FAISS store for index_dir, loading it on first use. None if it was never saved."""
+        with self._lock:
+            if index_dir in self._entries:
+                self._entries.move_to_end(index_dir)
+                return FAISS(embeddings, *self._entries[index_dir][0])
+        if not os.path.exists(os.path.join(index_dir, "index.faiss")):
+            return None
+        parts = read_lecture_index(index_dir)
+        self._insert(index_dir, parts)
+        return FAISS(embeddings, *parts)
+
+    def put(self, index_dir, vector_store):
+        """Register a store just built for index_dir, so the next get() doesn't reload it."""
+        self._insert(index_dir, (vector_store.index, vector_store.docstore, vector_store.index_to_docstore_id))
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+    def __len__(self):
+        return len(self._entries)
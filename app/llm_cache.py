@@ -0,0 +1,102 @@
+# llm_cache.py
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import contextlib
+
+
+def cache_key(**parts):
+    """Content address of a request: sha256 over its parts, in a stable order."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent cache of LLM responses in SQLite, shared by every process of the server.
+    Entries expire after ttl_seconds (0 = never); past max_bytes the least recently
+    used ones are dropped. Hit/miss counters are stored alongside, so they cover all
+    workers. A max_bytes of 0 disables the cache.
+    """
+
+    def __init__(self, db_path, max_bytes, ttl_seconds=0):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        if not self.enabled:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )""")
+            db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+            db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)  # autocommit
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def _count(self, db, name):
+        db.execute("INSERT INTO counters (name, value) VALUES (?, 1) "
+                   "ON CONFLICT(name) DO UPDATE SET value = value + 1", (name,))
+
+    def get(self, key):
+        """The cached response, or None on a miss (expired entries count as misses)."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row:
+                db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._count(db, "hits" if row else "misses")
+        return row[0] if row else None
+
+    def put(self, key, response):
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO responses (key, response, size, created_at, last_used) "
+                       "VALUES (?, ?, ?, ?, ?)", (key, response, len(response.encode("utf-8")), now, now))
+            self._evict(db, now)
+
+    def _evict(self, db, now):
+        if self.ttl_seconds:
+            db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    def stats(self):
+        if not self.enabled:
+            return {"enabled": False}
+        with self._connect() as db:
+            counters = dict(db.execute("SELECT name, value FROM counters").fetchall())
+            entries, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"enabled": True, "hits": counters.get("hits", 0), "misses": counters.get("misses", 0),
+                "entries": entries, "bytes": size}
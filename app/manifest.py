@@ -0,0 +1,81 @@
+# manifest.py
+
+import os
+import json
+import hashlib
+import threading
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def inputs_digest(*parts):
+    """Digest of everything an artifact was built from (upstream hashes, settings)."""
+    return hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()
+
+
+class SlideManifest:
+    """
+    Per-slide checkpoints of a job, persisted as JSON in its workspace:
+    {slide: {stage: {"inputs": digest, "artifacts": {name: {path, sha256, size, mtime_ns}}}}}.
+    A checkpoint is reusable while its inputs digest is unchanged and every artifact
+    still has its recorded content hash; files are only rehashed when their size or
+    mtime changed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f:
+                self._slides = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._slides = {}
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._slides, f)
+        os.replace(tmp_path, self.path)
+
+    def record(self, slide_number, stage, artifacts, inputs):
+        """Checkpoint a finished stage. artifacts: {name: path}."""
+        entry = {"inputs": inputs, "artifacts": {}}
+        for name, path in artifacts.items():
+            stat = os.stat(path)
+            entry["artifacts"][name] = {"path": path, "sha256": file_sha256(path),
+                                        "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        with self._lock:
+            self._slides.setdefault(str(slide_number), {})[stage] = entry
+            self._save()
+
+    def valid(self, slide_number, stage, inputs):
+        """{name: path} of a reusable checkpoint, or None if the stage has to run again."""
+        with self._lock:
+            entry = self._slides.get(str(slide_number), {}).get(stage)
+        if not entry or entry["inputs"] != inputs:
+            return None
+        for artifact in entry["artifacts"].values():
+            try:
+                stat = os.stat(artifact["path"])
+            except FileNotFoundError:
+                return None
+            if (stat.st_size, stat.st_mtime_ns) != (artifact["size"], artifact["mtime_ns"]) \
+                    and file_sha256(artifact["path"]) != artifact["sha256"]:
+                return None
+        return {name: artifact["path"] for name, artifact in entry["artifacts"].items()}
+
+    def digest(self, slide_number, stage, name):
+        """Recorded content hash of one artifact (to chain into the next stage's inputs)."""
+        with self._lock:
+            return self._slides[str(slide_number)][stage]["artifacts"][name]["sha256"]
+
+    def status(self):
+        """{slide: [checkpointed stages]}, for the resume API."""
+        with self._lock:
+            return {int(slide): sorted(stages) for slide, stages in self._slides.items()}
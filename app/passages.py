@@ -0,0 +1,140 @@
+# passages.py
+
+import tiktoken
+
+from text_chunker import SENTENCE_BOUNDARY, CLAUSE_BOUNDARY, split_long
+
+_encoding = None
+
+
+def count_tokens(text):
+    """
+    Tokens of text for OpenAI's chat and embedding models. Counts are only used for
+    budgeting, so if tiktoken can't load its encoding (it is downloaded on first use)
+    ~4 characters a token is assumed instead.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            print(f"Warning: tiktoken encoding unavailable, estimating tokens: {e}")
+            _encoding = False
+    if not _encoding:
+        return -(-len(text) // 4)
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def timestamp(seconds):
+    """m:ss (h:mm:ss past an hour) of a position in the video."""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    return f"{hours}:{rest // 60:02d}:{rest % 60:02d}" if hours else f"{rest // 60}:{rest % 60:02d}"
+
+
+def _sentences(script, max_tokens):
+    """(start offset, text) of each sentence, split on clauses when one alone is over max_tokens."""
+    # clauses are cut by characters; ~4 characters a token keeps them within the budget
+    max_chars = max_tokens * 4
+    units = []
+    for sentence in SENTENCE_BOUNDARY.split(script):
+        for unit in split_long(sentence.strip(), max_chars, [CLAUSE_BOUNDARY]) if sentence.strip() else []:
+            start = script.find(unit, units[-1][0] + len(units[-1][1]) if units else 0)
+            units.append((start, unit))
+    return units
+
+
+def slide_passages(script, max_tokens=120, overlap_tokens=30):
+    """
+    Split one slide's script into passages of whole sentences, up to max_tokens each,
+    every passage repeating the last ~overlap_tokens of the previous one so an answer
+    spanning the cut is still found in one piece. Returns (start offset, overlap
+    offset, text) triples, the overlap offset being where the new text begins.
+    """
+    units = [(start, text, count_tokens(text)) for start, text in _sentences(script, max_tokens)]
+    passages = []
+    first = 0
+    while first < len(units):
+        last, tokens = first, units[first][2]
+        while last + 1 < len(units) and tokens + units[last + 1][2] <= max_tokens:
+            last += 1
+            tokens += units[last][2]
+        start = units[first][0]
+        end = units[last][0] + len(units[last][1])
+        new_from = max(start, passages[-1][3]) if passages else start
+        passages.append((start, new_from, script[start:end], end))
+        if last + 1 >= len(units):
+            break
+        # step back over whole sentences, up to overlap_tokens, without repeating the full passage
+        following, overlap = last + 1, 0
+        while following - 1 > first and overlap + units[following - 1][2] <= overlap_tokens:
+            following -= 1
+            overlap += units[following][2]
+        first = following
+    return [(start, new_from - start, text) for start, new_from, text, _ in passages]
+
+
+def lecture_passages(scripts, timeline=None, max_tokens=120, overlap_tokens=30):
+    """
+    Retrieval passages of a lecture: (texts, metadatas) for FAISS.from_texts. Metadata
+    holds the slide number, the passage's position in it and the share it repeats from
+    the passage before ('overlap', in characters) and its token count. With a timeline
+    ({slide: (start, duration)} in the video) each passage also gets 'start' / 'end'
+    seconds, interpolated over the slide's narration by character position.
+    """
+    texts, metadatas = [], []
+    for slide_number, script in enumerate(scripts, start=1):
+        script = script.strip()
+        for chunk, (start, overlap, text) in enumerate(slide_passages(script, max_tokens, overlap_tokens)):
+            metadata = {'slide': slide_number, 'chunk': chunk, 'overlap': overlap, 'tokens': count_tokens(text)}
+            if timeline and slide_number in timeline:
+                slide_start, duration = timeline[slide_number]
+                metadata['start'] = round(slide_start + duration * start / len(script), 2)
+                metadata['end'] = round(slide_start + duration * (start + len(text)) / len(script), 2)
+            texts.append(text)
+            metadatas.append(metadata)
+    return texts, metadatas
+
+
+def fit_passages(docs, max_tokens):
+    """
+    The best-ranked docs (as the retriever returned them) that fit in max_tokens
+    together, back in lecture order. The first doc is always kept.
+    """
+    chosen, used = [], 0
+    for rank, doc in enumerate(docs):
+        tokens = doc.metadata.get('tokens') or count_tokens(doc.page_content)
+        if chosen and used + tokens > max_tokens:
+            continue
+        chosen.append((rank, doc))
+        used += tokens
+    return [doc for _, doc in sorted(chosen, key=lambda item: _position(item[1]) + (item[0],))]
+
+
+def _position(doc):
+    return doc.metadata.get('slide', 0), doc.metadata.get('chunk', 0)
+
+
+def format_passages(docs):
+    """
+    Context for the prompt, each passage labelled with its slide and time. A passage that
+    directly follows the previous one drops the text they share.
+    """
+    parts = []
+    previous = None
+    for doc in docs:
+        metadata = doc.metadata
+        text = doc.page_content
+        if 'slide' not in metadata:
+            parts.append(text)  # indexed before passages were tagged: whole scripts
+            previous = None
+            continue
+        if previous == (metadata['slide'], metadata['chunk'] - 1):
+            parts[-1] += " " + text[metadata['overlap']:].lstrip()
+        else:
+            label = f"Slide {metadata['slide']}"
+            if 'start' in metadata:
+                label += f", {timestamp(metadata['start'])}"
+            parts.append(f"[{label}] {text}")
+        previous = (metadata['slide'], metadata['chunk'])
+    return "\n\n".join(parts)
@@ -0,0 +1,99 @@
+# qa_registry.py
+
+import threading
+from collections import OrderedDict
+
+
+class LectureQA:
+    """
+    One lecture's chat state: where its index is saved, its scripts and fitted content
+    filter, plus the QA chains built over them. The index itself is left to the index
+    cache. Chains depend on the asking user's API key and safety instructions, so the
+    most recent max_chains of them are kept per lecture.
+    """
+
+    def __init__(self, lecture_id, index_dir, scripts, content_filter, build_chain, max_chains=8, video_url=None):
+        self.lecture_id = lecture_id
+        self.video_url = video_url
+        self.index_dir = index_dir
+        self.scripts = scripts
+        self.content_filter = content_filter  # None when it couldn't be fitted: every question passes
+        self._build_chain = build_chain  # build_chain(lecture, api_key, safety_instructions)
+        self.max_chains = max_chains
+        self._chains = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allows(self, question, threshold):
+        """Whether the question relates to this lecture, at the asking session's threshold."""
+        if self.content_filter is None:
+            return True
+        return self.content_filter.with_threshold(threshold)(question)
+
+    def chain(self, api_key, safety_instructions=None):
+        key = (api_key, safety_instructions or None)
+        with self._lock:
+            if key in self._chains:
+                self._chains.move_to_end(key)
+                return self._chains[key]
+        chain = self._build_chain(self, api_key, safety_instructions)
+        with self._lock:
+            self._chains[key] = chain
+            while len(self._chains) > self.max_chains:
+                self._chains.popitem(last=False)
+        return chain
+
+
+class QARegistry:
+    """
+    Chat state of many lectures in one process, keyed by lecture (job) id. Entries are
+    made by loader(lecture_id, api_key) on first use - at most once per lecture, even
+    when several requests ask for it together - and past max_lectures the least
+    recently used are dropped. loader returns None for lectures that can't be chatted
+    with (unknown, unfinished or expired); that isn't cached.
+    """
+
+    def __init__(self, loader, max_lectures=256):
+        self.loader = loader
+        self.max_lectures = max_lectures
+        self._entries = OrderedDict()  # lecture_id -> LectureQA
+        self._loading = {}  # lecture_id -> lock held while it loads
+        self._lock = threading.Lock()
+
+    def get(self, lecture_id, api_key):
+        """The lecture's LectureQA, loading it if needed; None if there is none."""
+        with self._lock:
+            if lecture_id in self._entries:
+                self._entries.move_to_end(lecture_id)
+                return self._entries[lecture_id]
+            loading = self._loading.setdefault(lecture_id, threading.Lock())
+        with loading:
+            with self._lock:
+                # loaded by a concurrent request while we waited
+                if lecture_id in self._entries:
+                    return self._entries[lecture_id]
+            try:
+                lecture = self.loader(lecture_id, api_key)
+                if lecture is not None:
+                    self._insert(lecture_id, lecture)
+            finally:
+                with self._lock:
+                    self._loading.pop(lecture_id, None)
+            return lecture
+
+    def _insert(self, lecture_id, lecture):
+        with self._lock:
+            self._entries[lecture_id] = lecture
+            self._entries.move_to_end(lecture_id)
+            while len(self._entries) > self.max_lectures:
+                self._entries.popitem(last=False)
+
+    def discard(self, lecture_id):
+        with self._lock:
+            self._entries.pop(lecture_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {"lectures": len(self._entries), "max_lectures": self.max_lectures}
+
+    def __len__(self):
+        return len(self._entries)
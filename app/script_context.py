@@ -0,0 +1,129 @@
+# script_context.py
+
+import io
+import re
+import json
+import math
+import base64
+import threading
+
+from PIL import Image
+
+# rough chars-per-token ratio for English prose; exact counts come back in response.usage
+CHARS_PER_TOKEN = 4
+
+
+def estimate_text_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def estimate_image_tokens(width, height):
+    """gpt-4o 'high' detail cost: fit in 2048x2048, shortest side to 768, 170 tokens per 512px tile."""
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def request_metrics(messages):
+    """Payload bytes, image count and estimated prompt tokens of a chat request."""
+    tokens = 0
+    images = 0
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            tokens += estimate_text_tokens(content)
+            continue
+        for part in content:
+            if part["type"] == "text":
+                tokens += estimate_text_tokens(part["text"])
+            elif part["type"] == "image_url":
+                images += 1
+                data = part["image_url"]["url"].split(",", 1)[-1]
+                with Image.open(io.BytesIO(base64.b64decode(data))) as img:
+                    tokens += estimate_image_tokens(*img.size)
+    return {
+        "bytes": len(json.dumps(messages).encode("utf-8")),
+        "images": images,
+        "estimated_tokens": tokens,
+    }
+
+
+def caption(script_text, max_words=25):
+    """First sentence of a script, capped at max_words."""
+    first_sentence = re.split(r'(?<=[.!?])\s+', script_text.strip(), maxsplit=1)[0]
+    words = first_sentence.split()
+    return " ".join(words[:max_words]) + ("..." if len(words) > max_words else "")
+
+
+def compact_history(previous_scripts, max_tokens, captions=True):
+    """
+    Trim earlier slides' scripts to fit max_tokens, keeping the most recent ones.
+    Scripts that don't fit whole are reduced to a caption when `captions` is set;
+    the walk stops at the first slide that doesn't fit at all.
+    :param previous_scripts: list of (slide_number, script_text), oldest first
+    """
+    selected = []
+    budget = max_tokens
+    for slide_number, script_text in reversed(previous_scripts):
+        if not script_text:
+            continue
+        cost = estimate_text_tokens(script_text)
+        if cost > budget and captions:
+            script_text = caption(script_text)
+            cost = estimate_text_tokens(script_text)
+        if cost > budget:
+            break
+        selected.append((slide_number, script_text))
+        budget -= cost
+    return selected[::-1]
+
+
+def script_context_messages(previous_scripts):
+    """
+    Text-only continuity context: the narration of earlier slides, oldest first.
+    :param previous_scripts: list of (slide_number, script_text)
+    """
+    narration = "\n\n".join(script_text for _, script_text in previous_scripts if script_text)
+    if not narration:
+        return []
+    return [{
+        "role": "user",
+        "content": f"For continuity, this is the narration of the preceding slides (do not repeat it):\n\n{narration}"
+    }]
+
+
+class ScriptHistory:
+    """
+    Scripts finished so far for one deck, shared by the threads scripting it.
+    Each slide's context is whichever of its `context_slides` predecessors (0 = all)
+    have finished, compacted to `context_tokens`. `metrics` collects per-request stats.
+    """
+
+    def __init__(self, context_slides, context_tokens, captions=True):
+        self.context_slides = context_slides
+        self.context_tokens = context_tokens
+        self.captions = captions
+        self.metrics = []
+        self._finished = {}
+        self._lock = threading.Lock()
+
+    def window(self, slide_number):
+        """The predecessors whose scripts may make up slide_number's context."""
+        first = max(1, slide_number - self.context_slides) if self.context_slides else 1
+        return range(first, slide_number)
+
+    def context_for(self, slide_number):
+        with self._lock:
+            previous = [(j, self._finished[j]) for j in self.window(slide_number) if j in self._finished]
+        return script_context_messages(compact_history(previous, self.context_tokens, self.captions))
+
+    def record(self, slide_number, script_text):
+        with self._lock:
+            self._finished[slide_number] = script_text
+
+    def summary(self):
+        return (f"{len(self.metrics)} requests, {sum(m['bytes'] for m in self.metrics) / 1024:.0f} KB sent, "
+                f"~{sum(m['estimated_tokens'] for m in self.metrics)} prompt tokens "
+                f"(billed: {sum(m.get('prompt_tokens', 0) for m in self.metrics)})")
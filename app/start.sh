@@ -1,6 +1,6 @@
 #!/bin/bash
 
-mkdir -p uploads output/images output/scripts output/audio static
+mkdir -p output/jobs static
 
 if command -v docker-compose &> /dev/null; then
     echo "Using docker-compose..."
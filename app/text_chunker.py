@@ -0,0 +1,73 @@
+# text_chunker.py
+
+import re
+
+# longest input each TTS engine takes per request. tts-1 accepts up to 4096 characters;
+# Play.ht chunks are kept short so a slide's chunks can be synthesized in parallel
+TTS_CHAR_LIMITS = {
+    'tts-1': 4096,
+    'Play3.0-mini': 500,
+}
+
+# sentence ends, and the bracketed section headers / timestamps scripts may contain
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?…])\s+|(?<=[.!?…]["\')])\s+|(?<=\])\s+')
+CLAUSE_BOUNDARY = re.compile(r'(?<=[,;:])\s+|\s+(?=[-–—]\s)')
+
+
+def split_long(text, max_chars, boundaries):
+    """
+    Split text into pieces of at most max_chars, at the first of boundaries (compiled
+    patterns, coarsest first) that works; words are the last resort.
+    """
+    if len(text) <= max_chars:
+        return [text]
+    if not boundaries:
+        # no clause left to split on: fall back to words, and hard-cut words that don't fit
+        pieces = []
+        for word in text.split():
+            pieces.extend(word[i:i + max_chars] for i in range(0, len(word), max_chars))
+        return pieces
+    parts = [part for part in boundaries[0].split(text) if part.strip()]
+    return [piece for part in parts for piece in split_long(part.strip(), max_chars, boundaries[1:])]
+
+
+def _pack(units, cap):
+    """Greedily pack units (in order) into chunks of at most cap characters, joined by spaces."""
+    chunks = []
+    current = []
+    length = 0
+    for unit in units:
+        added = len(unit) + (1 if current else 0)
+        if current and length + added > cap:
+            chunks.append(current)
+            current, length = [], 0
+            added = len(unit)
+        current.append(unit)
+        length += added
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_text_into_chunks(text, max_chars=500):
+    """
+    Split text for TTS on sentence boundaries (then clauses, then words when a sentence
+    alone is too long). Uses as few chunks as fit in max_chars, and among those packings
+    the one with the smallest largest chunk, so chunks come out similar in length.
+    Never returns empty chunks.
+    """
+    units = [unit for sentence in SENTENCE_BOUNDARY.split(text.strip()) if sentence.strip()
+             for unit in split_long(sentence.strip(), max_chars, [CLAUSE_BOUNDARY])]
+    if not units:
+        return []
+
+    count = len(_pack(units, max_chars))
+    # smallest cap that still packs into `count` chunks
+    low, high = max(max(len(unit) for unit in units), -(-len(" ".join(units)) // count)), max_chars
+    while low < high:
+        cap = (low + high) // 2
+        if len(_pack(units, cap)) <= count:
+            high = cap
+        else:
+            low = cap + 1
+    return [" ".join(chunk) for chunk in _pack(units, low)]
@@ -0,0 +1,121 @@
+# throttle.py
+
+import os
+import time
+import random
+import sqlite3
+import threading
+
+
+class TokenBucket:
+    """
+    Blocking token-bucket rate limiter shared by every thread of a process.
+    Refills `rate` tokens per second up to `capacity` (defaults to one second's worth).
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SharedTokenBucket:
+    """
+    TokenBucket whose state lives in SQLite, so every process using db_path - however
+    many workers are started, from the server or worker.py - draws from the same `rate`.
+    """
+
+    def __init__(self, db_path, name, rate, capacity=None):
+        self.db_path = db_path
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        db = self._connect()
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, "
+                       "updated REAL NOT NULL)")
+        finally:
+            db.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)  # autocommit
+
+    def acquire(self, tokens=1):
+        while True:
+            db = self._connect()
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                row = db.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (self.name,)).fetchone()
+                now = time.time()  # wall clock: shared between processes
+                available = self.capacity if row is None else \
+                    min(self.capacity, row[0] + max(0.0, now - row[1]) * self.rate)
+                granted = available >= tokens
+                if granted:
+                    available -= tokens
+                db.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                           (self.name, available, now))
+                db.execute("COMMIT")
+            finally:
+                db.close()
+            if granted:
+                return
+            time.sleep((tokens - available) / self.rate)
+
+
+def is_rate_limited(error):
+    """True for HTTP 429s (OpenAI, requests) and gRPC RESOURCE_EXHAUSTED (Play.ht)."""
+    response = getattr(error, 'response', None)
+    if 429 in (getattr(error, 'status_code', None), getattr(response, 'status_code', None)):
+        return True
+    code = getattr(error, 'code', None)
+    if callable(code):
+        try:
+            return getattr(code(), 'name', None) == 'RESOURCE_EXHAUSTED'
+        except Exception:
+            pass
+    message = str(error).lower()
+    return '429' in message or 'rate limit' in message
+
+
+def retry_after(error):
+    """Seconds from a Retry-After header, if the error carries one."""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def call_with_retry(func, bucket=None, retries=5, base_delay=1.0, max_delay=30.0):
+    """
+    Call func(), waiting on `bucket` before each attempt and retrying rate-limit errors
+    with full-jitter exponential backoff (or the server's Retry-After, when given).
+    Other errors, and the last rate-limit error, are raised.
+    """
+    for attempt in range(retries + 1):
+        if bucket:
+            bucket.acquire()
+        try:
+            return func()
+        except Exception as e:
+            if attempt == retries or not is_rate_limited(e):
+                raise
+            delay = retry_after(e) or random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+            print(f"[Throttle] rate limited, retrying in {delay:.1f}s (attempt {attempt + 1}/{retries})")
+            time.sleep(delay)
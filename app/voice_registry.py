@@ -0,0 +1,56 @@
+# voice_registry.py
+
+import os
+import time
+import sqlite3
+import contextlib
+
+
+class VoiceRegistry:
+    """
+    Play.ht clone IDs keyed by (Play.ht user, sha256 of the voice sample), kept in
+    SQLite so every process and session reuses them. validated_at is when the clone
+    was last known to exist; callers revalidate stale entries lazily.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS voices (
+                user_id TEXT NOT NULL,
+                sample_sha256 TEXT NOT NULL,
+                voice_id TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                validated_at REAL NOT NULL,
+                PRIMARY KEY (user_id, sample_sha256)
+            )""")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)  # autocommit
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def get(self, user_id, sample_sha256):
+        """(voice_id, validated_at), or None if this sample was never cloned for the user."""
+        with self._connect() as db:
+            return db.execute("SELECT voice_id, validated_at FROM voices WHERE user_id = ? AND sample_sha256 = ?",
+                              (user_id, sample_sha256)).fetchone()
+
+    def put(self, user_id, sample_sha256, voice_id):
+        now = time.time()
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO voices (user_id, sample_sha256, voice_id, created_at, validated_at) "
+                       "VALUES (?, ?, ?, ?, ?)", (user_id, sample_sha256, voice_id, now, now))
+
+    def mark_validated(self, user_id, sample_sha256):
+        with self._connect() as db:
+            db.execute("UPDATE voices SET validated_at = ? WHERE user_id = ? AND sample_sha256 = ?",
+                       (time.time(), user_id, sample_sha256))
+
+    def forget(self, user_id, sample_sha256):
+        with self._connect() as db:
+            db.execute("DELETE FROM voices WHERE user_id = ? AND sample_sha256 = ?", (user_id, sample_sha256))
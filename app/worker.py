@@ -0,0 +1,12 @@
+# worker.py
+# Runs queued uploads without a web server, e.g. `python worker.py 4` on another container
+# sharing output/ and static/ with the backend.
+
+import sys
+
+from app import app, job_worker, setup_directories
+from job_queue import start_workers
+
+if __name__ == '__main__':
+    setup_directories()
+    start_workers(int(sys.argv[1]) if len(sys.argv) > 1 else app.config['JOB_WORKERS'], job_worker)
@@ -0,0 +1,132 @@
+# workspaces.py
+
+import os
+import time
+import shutil
+import threading
+
+# one subdirectory per pipeline stage
+STAGE_DIRS = ('uploads', 'vision', 'images', 'scripts', 'audio', 'segments')
+
+
+class JobWorkspace:
+    """
+    Private directory tree of one upload job: <root>/<job_id>/{uploads,vision,images,...}.
+    The root's mtime is the job's last activity; the janitor expires workspaces by it.
+    """
+
+    def __init__(self, root, job_id):
+        self.job_id = job_id
+        self.path = os.path.join(root, job_id)
+
+    def dir(self, name):
+        return os.path.join(self.path, name)
+
+    def create(self):
+        for name in STAGE_DIRS:
+            os.makedirs(self.dir(name), exist_ok=True)
+        return self
+
+    def renditions(self, renditions):
+        """A copy of `renditions` with each output dir moved into this workspace (output/vision -> <job>/vision)."""
+        return {name: {**rendition, 'dir': self.dir(os.path.basename(os.path.normpath(rendition['dir'])))}
+                for name, rendition in renditions.items()}
+
+    def touch(self):
+        """Record activity, so a running job is never expired."""
+        try:
+            os.utime(self.path)
+        except FileNotFoundError:
+            pass
+
+    def remove(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def dir_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, filename)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+def sweep(roots, max_age, quota_bytes, grace=600):
+    """
+    Delete job directories (the subdirectories of each root) idle for longer than
+    max_age seconds, then the least recently active ones while all of them together
+    exceed quota_bytes. Directories active within `grace` seconds are never deleted.
+    A max_age or quota_bytes of 0 disables that limit. Returns the deleted paths.
+    """
+    now = time.time()
+    entries = []
+    for root in roots:
+        if not os.path.isdir(root):
+            continue
+        for name in os.listdir(root):
+            path = os.path.join(root, name)
+            try:
+                if os.path.isdir(path) and not os.path.islink(path):
+                    entries.append((os.stat(path).st_mtime, path))
+            except FileNotFoundError:
+                continue
+
+    removed = []
+    remaining = []
+    for mtime, path in sorted(entries):
+        if max_age and now - mtime > max(max_age, grace):
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(path)
+        else:
+            remaining.append((mtime, path))
+
+    if quota_bytes:
+        sizes = {path: dir_size(path) for _, path in remaining}
+        total = sum(sizes.values())
+        for mtime, path in remaining:
+            if total <= quota_bytes:
+                break
+            if now - mtime < grace:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(path)
+            total -= sizes[path]
+    return removed
+
+
+class WorkspaceJanitor(threading.Thread):
+    """
+    Background thread running sweep() every `interval` seconds over each of `areas`,
+    a list of (roots, max_age, quota_bytes) with their own limits, followed by the
+    other periodic housekeeping callables in `tasks`.
+    """
+
+    def __init__(self, areas, interval=600, tasks=()):
+        super().__init__(name="workspace-janitor", daemon=True)
+        self.areas = areas
+        self.interval = interval
+        self.tasks = tasks
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            for roots, max_age, quota_bytes in self.areas:
+                if not (max_age or quota_bytes):
+                    continue
+                try:
+                    removed = sweep(roots, max_age, quota_bytes)
+                    if removed:
+                        print(f"[Janitor] removed {len(removed)} expired directories from {', '.join(roots)}")
+                except Exception as e:
+                    print(f"[Janitor] sweep failed: {e}")
+            for task in self.tasks:
+                try:
+                    task()
+                except Exception as e:
+                    print(f"[Janitor] {getattr(task, '__name__', task)} failed: {e}")
+
+    def stop(self):
+        self._stopped.set()
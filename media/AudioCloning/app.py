@@ -3,6 +3,7 @@ import re
 import base64
 import time
 import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from tqdm import tqdm
 from PIL import Image
 import fitz  # PyMuPDF
@@ -15,6 +16,7 @@ from werkzeug.utils import secure_filename
 import pymupdf  # Correct import for PyMuPDF
 from flask import Response
 from mongo_setup import save_video_to_mongo, get_all_video_filenames, get_video_file_by_name, fs
+from audio_probe import durations as audio_durations
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -22,6 +24,7 @@ app.secret_key = 'your_secret_key_here'  # Change this to a secure key
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['OUTPUT_FOLDER'] = 'output'
 app.config['ALLOWED_EXTENSIONS'] = {'pdf', 'mp3'}
+app.config['RENDER_WORKERS'] = int(os.getenv('RENDER_WORKERS', os.cpu_count() or 1))  # PDF render processes
 
 # Helper function to check allowed file extensions
 def allowed_file(filename):
@@ -191,21 +194,44 @@ def split_text_into_chunks(text, max_lines=6, max_chars=500):
 
 # Function to convert PDF to images
 
-def convert_pdf_to_images(pdf_path):
-    images_dir = os.path.join(app.config['OUTPUT_FOLDER'], 'images')
-    os.makedirs(images_dir, exist_ok=True)
-    
-    pdf_document = pymupdf.open(pdf_path)  # Use pymupdf.open instead of fitz.open
-    for page_number in tqdm(range(pdf_document.page_count), desc="Converting PDF pages", unit="page"):
+def render_pdf_pages(pdf_path, page_numbers, images_dir, zoom=300 / 72):
+    # Each render worker opens its own document; fitz objects can't be shared across processes
+    pdf_document = pymupdf.open(pdf_path)
+    matrix = pymupdf.Matrix(zoom, zoom)  # Scale factor for high-resolution images
+    rendered = 0
+    for page_number in page_numbers:
         page = pdf_document[page_number]
-        zoom = 300 / 72  # Scale factor for high-resolution images
-        matrix = pymupdf.Matrix(zoom, zoom)  # Use pymupdf.Matrix
         pixmap = page.get_pixmap(matrix=matrix)
         img_data = Image.frombytes("RGB", [pixmap.width, pixmap.height], pixmap.samples)
         output_path = os.path.join(images_dir, f'page_{page_number + 1}.png')
         img_data.save(output_path, 'PNG')
-    
+        rendered += 1
+
     pdf_document.close()
+    return rendered
+
+def convert_pdf_to_images(pdf_path, workers=None):
+    images_dir = os.path.join(app.config['OUTPUT_FOLDER'], 'images')
+    os.makedirs(images_dir, exist_ok=True)
+
+    pdf_document = pymupdf.open(pdf_path)  # Use pymupdf.open instead of fitz.open
+    page_count = pdf_document.page_count
+    pdf_document.close()
+
+    # Shard pages across worker processes: worker k renders pages k, k + workers, ...
+    workers = min(workers or app.config['RENDER_WORKERS'], page_count)
+    if workers <= 1:
+        pages = tqdm(range(page_count), desc="Converting PDF pages", unit="page")
+        render_pdf_pages(pdf_path, pages, images_dir)
+        return images_dir
+
+    shards = [range(start, page_count, workers) for start in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(render_pdf_pages, pdf_path, shard, images_dir) for shard in shards]
+        with tqdm(total=page_count, desc="Converting PDF pages", unit="page") as progress:
+            for future in as_completed(futures):
+                progress.update(future.result())
+
     return images_dir
 
 # Function to generate scripts for images
@@ -282,16 +308,10 @@ def generate_audio_files(scripts_list, openai_api_key, playht_api_key=None, user
 
 def get_audio_duration(audio_path):
     """
-    Get audio duration using ffprobe.
+    Get audio duration, parsed in-process from the MP3 frame headers (ffprobe only for
+    other formats) and cached by path, size and mtime.
     """
-    
-    result = subprocess.run(
-        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-         '-of', 'default=noprint_wrappers=1:nokey=1', audio_path],
-        capture_output=True,
-        text=True
-    )
-    return float(result.stdout.strip()) if result.stdout.strip() else 0.0
+    return audio_durations.get(audio_path)
 
 def get_sorted_pairs(images_dir, audio_dir):
     """
@@ -338,9 +358,9 @@ def create_video_ffmpeg(images_dir, audio_dir, output_path="output/slideshow.mp4
     inputs = []
     filter_complex = []
 
-    for i, (img, aud) in enumerate(pairs):
+    durations = audio_durations.get_many([aud for _, aud in pairs])
+    for i, ((img, aud), duration) in enumerate(zip(pairs, durations)):
         inputs.extend(['-loop', '1', '-i', img, '-i', aud])
-        duration = get_audio_duration(aud)
         filter_complex.extend([
             f'[{2*i}:v]trim=duration={duration},setpts=PTS-STARTPTS[v{i}];',
             f'[{2*i+1}:a]acopy[a{i}];'
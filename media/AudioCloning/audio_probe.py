@@ -0,0 +1,161 @@
+# audio_probe.py
+
+import os
+import subprocess
+import threading
+
+# kbps by [MPEG-1?][layer]; index 0 (free format) and 15 (bad) are invalid
+_BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+# Hz by version bits (0 = MPEG-2.5, 2 = MPEG-2, 3 = MPEG-1)
+_SAMPLE_RATES = {0: [11025, 12000, 8000], 2: [22050, 24000, 16000], 3: [44100, 48000, 32000]}
+
+
+def _frame_header(data, pos):
+    """(frame length, samples, sample rate) of the MPEG audio frame at pos, or None."""
+    if data[pos] != 0xFF or data[pos + 1] & 0xE0 != 0xE0:
+        return None
+    version = (data[pos + 1] >> 3) & 3
+    layer = 4 - ((data[pos + 1] >> 1) & 3)
+    bitrate_index = data[pos + 2] >> 4
+    rate_index = (data[pos + 2] >> 2) & 3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (data[pos + 2] >> 1) & 1
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    samples = 1152 if (layer == 2 or mpeg1) else 576
+    return samples // 8 * bitrate // sample_rate + padding, samples, sample_rate
+
+
+def _followed_by_frame(data, pos):
+    """
+    Whether a frame ending at pos is followed by another frame, a tag or the end of the
+    data. Lone sync patterns are common in non-MP3 bytes, so a header found after a gap
+    only counts if this holds.
+    """
+    if pos == len(data) or data[pos:pos + 3] in (b"ID3", b"TAG"):
+        return True
+    if pos + 4 > len(data):
+        return False
+    header = _frame_header(data, pos)
+    return header is not None and header[0] >= 4
+
+
+def mp3_frames(data):
+    """
+    Yield (offset, length, samples, sample_rate, is_info) for every MPEG audio frame in
+    MP3 bytes, skipping ID3/TAG metadata and resyncing over garbage. is_info marks a
+    LAME/Xing header frame, which carries stream metadata rather than audio.
+    Works on concatenated streams (e.g. Play.ht chunks).
+    """
+    pos = 0
+    end = len(data)
+    synced = False  # a frame ended right here
+    while pos + 4 <= end:
+        if data[pos:pos + 3] == b"ID3" and pos + 10 <= end:
+            size = ((data[pos + 6] & 0x7F) << 21 | (data[pos + 7] & 0x7F) << 14
+                    | (data[pos + 8] & 0x7F) << 7 | (data[pos + 9] & 0x7F))
+            pos += 10 + size + (10 if data[pos + 5] & 0x10 else 0)
+            synced = False
+            continue
+        if data[pos:pos + 3] == b"TAG":
+            pos += 128
+            synced = False
+            continue
+        header = _frame_header(data, pos)
+        if header is None or header[0] < 4 or not (synced or _followed_by_frame(data, pos + header[0])):
+            pos += 1  # resync
+            synced = False
+            continue
+        length, samples, sample_rate = header
+        is_info = data.find(b"Xing", pos + 4, pos + 40) != -1 or data.find(b"Info", pos + 4, pos + 40) != -1
+        yield pos, length, samples, sample_rate, is_info
+        pos += length
+        synced = True
+
+
+def mp3_duration(data):
+    """
+    Duration in seconds of MP3 bytes, summed over every audio frame.
+    Raises ValueError when no MPEG audio frames are found.
+    """
+    duration = sum(samples / sample_rate for _, _, samples, sample_rate, is_info in mp3_frames(data) if not is_info)
+    if not duration:
+        raise ValueError("no MPEG audio frames found")
+    return duration
+
+
+def concat_mp3(streams):
+    """
+    Join MP3 byte streams on frame boundaries: only their audio frames are kept, so the
+    ID3 tags and Xing/Info headers of later streams can't end up mid-file (where they
+    would break seeking and duration estimates) and truncated trailing frames are dropped.
+    """
+    return b"".join(
+        data[offset:offset + length]
+        for data in streams
+        for offset, length, _, _, is_info in mp3_frames(data)
+        if not is_info and offset + length <= len(data)
+    )
+
+
+def ffprobe_duration(audio_path):
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+         '-of', 'default=noprint_wrappers=1:nokey=1', audio_path],
+        capture_output=True,
+        text=True
+    )
+    return float(result.stdout.strip()) if result.stdout.strip() else 0.0
+
+
+class DurationCache:
+    """
+    Audio durations keyed by (path, size, mtime), so a rewritten file is probed again.
+    MP3s are measured in-process; anything else falls back to one ffprobe call.
+    """
+
+    def __init__(self):
+        self._durations = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(audio_path):
+        stat = os.stat(audio_path)
+        return os.path.abspath(audio_path), stat.st_size, stat.st_mtime_ns
+
+    def record(self, audio_path, duration):
+        """Remember a duration the caller already knows (e.g. the TTS stage, right after writing)."""
+        key = self._key(audio_path)
+        with self._lock:
+            self._durations[key] = duration
+
+    def get(self, audio_path):
+        key = self._key(audio_path)
+        with self._lock:
+            if key in self._durations:
+                return self._durations[key]
+        try:
+            with open(audio_path, "rb") as f:
+                duration = mp3_duration(f.read())
+        except ValueError:
+            duration = ffprobe_duration(audio_path)
+        with self._lock:
+            self._durations[key] = duration
+        return duration
+
+    def get_many(self, audio_paths):
+        return [self.get(audio_path) for audio_path in audio_paths]
+
+
+durations = DurationCache()
@@ -1,38 +1,44 @@
 import argparse
-import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 from langchain_openai import OpenAIEmbeddings, OpenAI
 from langchain_community.vectorstores import FAISS
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 
-def create_content_filter(scripts, threshold=0.04):
-    """content filter for questions."""
-    combined_text = " ".join(scripts)
-    vectorizer = TfidfVectorizer(
-        stop_words='english',
-        ngram_range=(1, 2),
-        min_df=1,
-        max_df=1.0
-    )
-    texts_to_fit = scripts + [combined_text]
-    vectorizer.fit(texts_to_fit)
-    
-    def filter_func(question):
+class ContentFilter:
+    """content filter for questions: fitted once, corpus kept as an L2-normalized sparse matrix."""
+
+    def __init__(self, scripts, threshold=0.04):
+        self.threshold = threshold
+        self.vectorizer = TfidfVectorizer(
+            stop_words='english',
+            ngram_range=(1, 2),
+            min_df=1,
+            max_df=1.0,
+            norm='l2'
+        )
+        texts_to_fit = scripts + [" ".join(scripts)]
+        self.corpus = self.vectorizer.fit_transform(texts_to_fit).T.tocsr()
+
+    def scores(self, questions):
+        """max cosine similarity of each question to the lecture, one sparse product for the batch."""
+        question_tfidf = self.vectorizer.transform([question.strip().lower() for question in questions])
+        return (question_tfidf @ self.corpus).max(axis=1).toarray().ravel()
+
+    def batch(self, questions):
         try:
-            question = question.strip().lower()
-            if not question:
-                return False
-            question_tfidf = vectorizer.transform([question])
-            texts_tfidf = vectorizer.transform(texts_to_fit)
-            max_sim = np.max(cosine_similarity(question_tfidf, texts_tfidf).flatten())
-            return max_sim > threshold
+            sims = self.scores(questions)
         except Exception:
-            return True
-    
-    return filter_func
+            return [bool(question.strip()) for question in questions]
+        return [bool(question.strip()) and bool(sim > self.threshold) for question, sim in zip(questions, sims)]
+
+    def __call__(self, question):
+        return self.batch([question])[0]
+
+def create_content_filter(scripts, threshold=0.04):
+    """content filter for questions."""
+    return ContentFilter(scripts, threshold)
 
 def setup_qa_chain(scripts, api_key):
     """setup QA chain."""
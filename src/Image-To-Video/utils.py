@@ -6,6 +6,7 @@ from tqdm import tqdm
 import fitz
 from PIL import Image
 import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 def setup_directories():
     for d in ["uploads", "output/images", "output/scripts", "output/audio", "static"]:
@@ -41,21 +42,43 @@ def natural_sort_key(s):
     return [int(text) if text.isdigit() else text.lower()
             for text in re.split(r'(\d+)', s)]
 
-def convert_pdf_to_images(pdf_path):
-    images_dir = "output/images"
-    os.makedirs(images_dir, exist_ok=True)
-
+def render_pdf_pages(pdf_path, page_numbers, images_dir, zoom=300 / 72):
+    """render the given (0-based) pages to page_N.png; opens its own fitz document."""
     pdf_document = fitz.open(pdf_path)
-    for page_number in tqdm(range(pdf_document.page_count), desc="Converting PDF pages"):
+    matrix = fitz.Matrix(zoom, zoom)
+    rendered = 0
+    for page_number in page_numbers:
         page = pdf_document[page_number]
-        zoom = 300 / 72
-        matrix = fitz.Matrix(zoom, zoom)
         pixmap = page.get_pixmap(matrix=matrix)
         img_data = Image.frombytes("RGB", [pixmap.width, pixmap.height], pixmap.samples)
         output_path = os.path.join(images_dir, f'page_{page_number + 1}.png')
         img_data.save(output_path, 'PNG')
-    
+        rendered += 1
+
     pdf_document.close()
+    return rendered
+
+def convert_pdf_to_images(pdf_path, workers=None):
+    """render pages in parallel, sharded across `workers` processes (default: all cores)."""
+    images_dir = "output/images"
+    os.makedirs(images_dir, exist_ok=True)
+
+    pdf_document = fitz.open(pdf_path)
+    page_count = pdf_document.page_count
+    pdf_document.close()
+
+    workers = min(workers or os.cpu_count() or 1, page_count)
+    if workers <= 1:
+        render_pdf_pages(pdf_path, tqdm(range(page_count), desc="Converting PDF pages"), images_dir)
+        return images_dir
+
+    shards = [range(start, page_count, workers) for start in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(render_pdf_pages, pdf_path, shard, images_dir) for shard in shards]
+        with tqdm(total=page_count, desc="Converting PDF pages") as progress:
+            for future in as_completed(futures):
+                progress.update(future.result())
+
     return images_dir
 
 def get_audio_duration(audio_path):
@@ -121,6 +121,7 @@ def main():
     parser.add_argument("pdf_path", help="Path to the PDF file")
     parser.add_argument("api_key", help="OpenAI API key")
     parser.add_argument("--output", default="output.mp4", help="Output video path")
+    parser.add_argument("--workers", type=int, default=None, help="PDF render processes (default: all cores)")
     args = parser.parse_args()
 
     setup_directories()
@@ -128,7 +129,7 @@ def main():
 
     try:
         print("Converting PDF to images...")
-        images_dir = convert_pdf_to_images(args.pdf_path)
+        images_dir = convert_pdf_to_images(args.pdf_path, workers=args.workers)
         
         print("Generating scripts...")
         scripts_dir = "output/scripts"